@@ -1,7 +1,3 @@
-from datetime import date, timedelta
-from tempfile import NamedTemporaryFile
-from urllib.request import urlopen
-
 from csvexport.actions import csvexport
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
@@ -13,7 +9,40 @@ from django.utils.translation import ngettext
 from django_object_actions import DjangoObjectActions, action
 
 from .errors import MaxLoansError, BookUnavailableError, MaxRenewalsError
-from .models import LibraryUser, Author, Book, BookCopy, Loan, Reservation, HistoryLoan
+from .models import (
+    LibraryUser,
+    Author,
+    Book,
+    BookCopy,
+    Loan,
+    Reservation,
+    HistoryLoan,
+    ImportJob,
+    CoverDownloadJob,
+    OutboxEmail,
+    canonical_isbn,
+)
+from .openlibrary import download_file
+from .reservations import allocate_new_copies
+from .signals import reservations_handled_in_bulk
+
+
+class ISBNSearchMixin:
+    """Model admin mixin allowing objects to be found by searching either isbn of
+    their book, using the indexed isbn-13 form of the isbn (alongside an exact
+    isbn search field, for books stored with an invalid isbn)."""
+
+    # lookup from the model admin's model to its book's isbn13 field
+    isbn13_lookup = "isbn13"
+
+    def get_search_results(self, request, queryset, search_term):
+        base_queryset = queryset
+        queryset, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if isbn13 := canonical_isbn(search_term.strip()):
+            queryset |= base_queryset.filter(**{self.isbn13_lookup: isbn13})
+        return queryset, may_have_duplicates
 
 
 class BookCopyInline(admin.TabularInline):
@@ -92,19 +121,13 @@ class ReservationExpiredListFilter(admin.SimpleListFilter):
         # Compare the requested value (either 'true' or 'false')
         # to decide how to filter the queryset.
         if self.value() == "1":
-            return queryset.filter(
-                ready_since__isnull=False,
-                ready_since__lte=(date.today() - timedelta(days=7)),
-            )
+            return queryset.expired()
         if self.value() == "0":
-            return queryset.filter(
-                Q(ready_since__isnull=True)
-                | Q(ready_since__gt=(date.today() - timedelta(days=7)))
-            )
+            return queryset.exclude(pk__in=queryset.expired())
 
 
 @admin.register(Book)
-class BookAdmin(DjangoObjectActions, admin.ModelAdmin):
+class BookAdmin(ISBNSearchMixin, DjangoObjectActions, admin.ModelAdmin):
     """Book admin allowing management of stock, kiosk system, home page,
     data import and filtering of stock items from the changelist, as well as
     data editing, cover image management, book copy management, and reservation
@@ -131,6 +154,15 @@ class BookAdmin(DjangoObjectActions, admin.ModelAdmin):
     change_actions = ["download_single_image", "search_on_amazon"]
     inlines = [BookCopyInline, ReservationInline]
 
+    def save_formset(self, request, form, formset, change):
+        """Give the copies added with the book copy inline to waiting reservations
+        together once they're all saved, rather than one at a time."""
+        if formset.model is not BookCopy:
+            return super().save_formset(request, form, formset, change)
+        with reservations_handled_in_bulk():
+            super().save_formset(request, form, formset, change)
+        allocate_new_copies(formset.new_objects)
+
     @admin.display(
         boolean=True,
         description="Has cover",
@@ -138,40 +170,45 @@ class BookAdmin(DjangoObjectActions, admin.ModelAdmin):
     def has_cover(self, obj):
         return bool(obj.cover_file)
 
-    @admin.display(description="Num. copies available")
+    @admin.display(description="Num. copies available", ordering="available_count")
     def num_copies(self, obj):
-        return f"{obj.num_copies_available} / {obj.copies.count()}"
+        return f"{obj.num_copies_available} / {obj.num_copies}"
 
     @admin.action(description="Download image(s) from cover_url")
     def download_image(self, request, queryset):
-        """Download image from the url in the selected books' cover_url fields and
-        store the file in their cover_file fields."""
-
-        # initialise image download counter
-        images_downloaded = 0
-
-        # loop through every selected book, check if it has a cover_url but not
-        # a downloaded cover_file, and if so download the image into a temporary file
-        # and save it to the cover_file field
-        for obj in queryset:
-            if obj.cover_url and not obj.cover_file:
-                img_temp = NamedTemporaryFile(delete=True)
-                img_temp.write(urlopen(obj.cover_url).read())
-                img_temp.flush()
-                obj.cover_file.save(obj.pk, File(img_temp))
-                images_downloaded += 1
-
-        # send a success message detailing how many images were successfully downloaded
+        """Submit a job to download the images from the urls in the selected books'
+        cover_url fields and store the files in their cover_file fields in the
+        background (run by `manage.py run_import_worker`), then show its progress."""
+
+        # only books with a cover_url but not a downloaded cover_file need a cover (the
+        # job checks again as it goes, so submitting the same books twice is safe)
+        isbns = list(
+            queryset.filter(Q(cover_file="") | Q(cover_file__isnull=True))
+            .exclude(cover_url="")
+            .values_list("isbn", flat=True)
+        )
+        if not isbns:
+            self.message_user(
+                request,
+                "None of the selected books have a cover to download.",
+                messages.WARNING,
+            )
+            return
+
+        job = CoverDownloadJob.objects.create(user=request.user, isbns=isbns)
         self.message_user(
             request,
             ngettext(
-                "%d image was successfully downloaded.",
-                "%d images were successfully downloaded.",
-                images_downloaded,
+                "%d image is being downloaded in the background.",
+                "%d images are being downloaded in the background.",
+                len(isbns),
             )
-            % images_downloaded,
+            % len(isbns),
             messages.SUCCESS,
         )
+        return HttpResponseRedirect(
+            reverse("admin:lms_coverdownloadjob_change", args=(job.pk,))
+        )
 
     @admin.action(description="Add book(s) to featured")
     def add_featured(self, request, queryset):
@@ -195,12 +232,10 @@ class BookAdmin(DjangoObjectActions, admin.ModelAdmin):
         store the file in its cover_file field (from the detail page)."""
 
         # check if the book has a cover-Url, and if so download the
-        # image into a temporary file and save it to the cover_file field
-        if obj.cover_url:
-            img_temp = NamedTemporaryFile(delete=True)
-            img_temp.write(urlopen(obj.cover_url).read())
-            img_temp.flush()
-            obj.cover_file.save(obj.pk, File(img_temp))
+        # image into a temporary file and save it to the cover_file field (the file is
+        # only None if it can't be downloaded in offline mode)
+        if obj.cover_url and (img_temp := download_file(obj.cover_url)) is not None:
+            obj.save_cover(File(img_temp))
 
             self.message_user(
                 request,
@@ -232,17 +267,18 @@ class BookAdmin(DjangoObjectActions, admin.ModelAdmin):
 
 
 @admin.register(BookCopy)
-class BookCopyAdmin(DjangoObjectActions, admin.ModelAdmin):
+class BookCopyAdmin(ISBNSearchMixin, DjangoObjectActions, admin.ModelAdmin):
     """Book copy admin allowing viewing info on and filtering of stock items from
     the changelist, as well as data editing, current loan management, loan history
     information, and reservation management from the detail view."""
 
     search_fields = [
-        "book__title__icontains",
         "book__isbn__exact",
+        "book__title__icontains",
         "book__edition_id__exact",
         "accession_code__iexact",
     ]
+    isbn13_lookup = "book__isbn13"
     autocomplete_fields = ["book"]
     list_display = [
         "accession_code",
@@ -253,6 +289,8 @@ class BookCopyAdmin(DjangoObjectActions, admin.ModelAdmin):
         "due_date",
     ]
     list_filter = [("current_loan", admin.EmptyFieldListFilter)]
+    # the due date column reads each copy's loan or reservation
+    list_select_related = ["book", "current_loan", "reservation"]
     actions = [csvexport]
     change_actions = ["renew_loan", "force_loan_renewal"]
     inlines = [LoanInline, HistoryLoanInline, ReservationInline]
@@ -355,6 +393,7 @@ class ReservationAdmin(DjangoObjectActions, admin.ModelAdmin):
     list_display = [
         "book_title",
         "user_full_name",
+        "created",
         "has_copy",
         "accession_code",
         "ready_since",
@@ -474,6 +513,92 @@ class ReservationAdmin(DjangoObjectActions, admin.ModelAdmin):
             )
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """Import job admin allowing the progress and results of imports submitted from
+    the book import page to be viewed."""
+
+    list_display = ["id", "user", "status", "created", "finished", "progress"]
+    list_filter = ["status"]
+    readonly_fields = [
+        "user",
+        "status",
+        "created",
+        "started",
+        "heartbeat",
+        "finished",
+        "includes_accessions",
+        "rows",
+        "rows_done",
+        "errors",
+        "successes",
+        "error_message",
+    ]
+
+    @admin.display(description="Rows imported")
+    def progress(self, obj):
+        return f"{obj.rows_done} / {len(obj.rows)}"
+
+    def has_add_permission(self, request):
+        # jobs are submitted from the book import page
+        return False
+
+
+@admin.register(CoverDownloadJob)
+class CoverDownloadJobAdmin(admin.ModelAdmin):
+    """Cover download job admin allowing the progress of cover downloads submitted
+    with the book admin's download action to be viewed."""
+
+    list_display = ["id", "user", "status", "created", "finished", "progress"]
+    list_filter = ["status"]
+    readonly_fields = [
+        "user",
+        "status",
+        "created",
+        "started",
+        "heartbeat",
+        "finished",
+        "progress",
+        "downloaded",
+        "failed",
+        "error_message",
+    ]
+    exclude = ["isbns", "books_done"]
+
+    @admin.display(description="Books done")
+    def progress(self, obj):
+        return f"{obj.books_done} / {len(obj.isbns)}"
+
+    def has_add_permission(self, request):
+        # jobs are submitted with the book admin's download action
+        return False
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Outbox email admin allowing the emails queued for the email dispatcher to be
+    viewed, e.g. to find out why one wasn't sent."""
+
+    list_display = ["subject", "recipient", "status", "created", "attempts", "sent"]
+    list_filter = ["status"]
+    search_fields = ["recipient__iexact"]
+    readonly_fields = [
+        "recipient",
+        "subject",
+        "body",
+        "status",
+        "created",
+        "next_attempt",
+        "attempts",
+        "sent",
+        "error_message",
+    ]
+
+    def has_add_permission(self, request):
+        # emails are queued by the changes they are about
+        return False
+
+
 # register the user model with Django's built-in model admin that allows passwords to
 # be reset, account information viewed in a sensible manner, etc.
 admin.site.register(LibraryUser, UserAdmin)
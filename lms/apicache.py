@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import functools
+import io
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO, Optional
+
+from django.conf import settings
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for API responses, storing each response as its own file
+    in a directory per kind of response (e.g. `isbn/0552124753`). Entries older than
+    the ttl are treated as missing, and once the cache grows past its maximum size the
+    least recently used entries are deleted.
+
+    Args:
+        directory: directory to store the cache files in (created if necessary)
+        ttl: number of seconds an entry is valid for after being stored
+        max_size: maximum total size of the cache files in bytes
+    """
+
+    def __init__(self, directory: Path, ttl: int, max_size: int):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # total size of the cache files, found by scanning the directory when needed
+        self._size: Optional[int] = None
+
+    def path(self, kind: str, key: str) -> Path:
+        """Get the path of the file an entry is stored in, replacing any characters
+        that aren't safe in file names."""
+        return self.directory / kind / re.sub(r"[^\w.-]", "_", key)
+
+    def open(
+        self, kind: str, key: str, ttl: Optional[int] = None
+    ) -> Optional[BinaryIO]:
+        """Open the file of an entry for reading, or return None if it doesn't exist or
+        has expired (using a different ttl than the cache's if one is provided)."""
+        path = self.path(kind, key)
+        try:
+            stat = path.stat()
+            # the creation time isn't reliably available, so expiry is based on the
+            # modification time (which is set when the entry is stored)
+            if stat.st_mtime + (self.ttl if ttl is None else ttl) < time.time():
+                return None
+            file = path.open("rb")
+        except FileNotFoundError:
+            return None
+        # mark the entry as recently used by updating its access time, leaving its
+        # modification time alone
+        os.utime(path, (time.time(), stat.st_mtime))
+        return file
+
+    def get(self, kind: str, key: str, ttl: Optional[int] = None) -> Optional[bytes]:
+        """Get the content of an entry, or None if it doesn't exist or has expired."""
+        file = self.open(kind, key, ttl)
+        if file is None:
+            return None
+        with file:
+            return file.read()
+
+    def set(self, kind: str, key: str, content: bytes):
+        """Store the content of an entry, evicting old entries if the cache has grown
+        too large."""
+        self.set_file(kind, key, io.BytesIO(content))
+
+    def set_file(self, kind: str, key: str, file: BinaryIO):
+        """Store the content of an entry from a file, copying it in chunks so it is
+        never held in memory all at once."""
+        path = self.path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so readers never see half-written entries
+        with NamedTemporaryFile(dir=path.parent, delete=False) as temp_file:
+            shutil.copyfileobj(file, temp_file)
+            size = temp_file.tell()
+
+        with self._lock:
+            # an entry being replaced no longer counts towards the size
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(temp_file.name, path)
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size - old_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def clear(self):
+        """Delete every entry in the cache."""
+        with self._lock:
+            for path in self._entries():
+                path.unlink(missing_ok=True)
+            self._size = 0
+
+    def _entries(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return [path for path in self.directory.glob("*/*") if path.is_file()]
+
+    def _scan_size(self) -> int:
+        return sum(path.stat().st_size for path in self._entries())
+
+    def _evict(self):
+        """Delete expired entries, then the least recently used entries until the
+        cache is 90% of its maximum size, leaving room for new entries before the
+        directory has to be scanned again."""
+        now = time.time()
+        entries = []
+        for path in self._entries():
+            stat = path.stat()
+            if stat.st_mtime + self.ttl < now:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_size * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+
+@functools.cache
+def get_cache() -> Optional[ResponseCache]:
+    """Get the OpenLibrary response cache configured in the settings, or None if
+    caching is disabled."""
+    directory = getattr(settings, "LMS_OPENLIBRARY_CACHE_DIR", None)
+    if directory is None:
+        return None
+    return ResponseCache(
+        directory,
+        ttl=getattr(settings, "LMS_OPENLIBRARY_CACHE_TTL", 60 * 60 * 24 * 30),
+        max_size=getattr(settings, "LMS_OPENLIBRARY_CACHE_MAX_SIZE", 500 * 1024**2),
+    )
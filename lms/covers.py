@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import posixpath
+import re
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Optional
+
+from django.core.files import File, locks
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.db.models.fields.files import FieldFile
+from PIL import Image, features
+
+# maximum height in pixels of each resized version of a cover, at least the height it
+# is shown at: lists show covers 50px high (so they get twice that for high density
+# screens), book cards 352px and book pages 350px
+COVER_VARIANTS = {
+    "thumbnail": 100,
+    "card": 352,
+    "detail": 700,
+}
+# WebP is much smaller than JPEG at the same quality, but Pillow can be built without it
+VARIANT_FORMAT, VARIANT_EXTENSION = (
+    ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+)
+VARIANT_QUALITY = 80
+# file extensions of the image formats covers are usually stored in
+COVER_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+# names of content addressed covers and their resized versions
+IMMUTABLE_NAME_RE = re.compile(
+    r"^book_covers/[0-9a-f]{2}/[0-9a-f]{2}/(variants/)?[0-9a-f]{64}[-.]"
+)
+# file locked by `cover_lock`
+LOCK_NAME = "book_covers/.lock"
+
+# how many times the current thread has entered `cover_lock`
+_lock_state = threading.local()
+
+
+class CoverStorage(FileSystemStorage):
+    """
+    File system storage that stores each cover under the sha256 hash of its content,
+    sharded into two levels of directories by the start of the hash (e.g.
+    `book_covers/9f/86/9f86d08...jpg`), so no directory grows too large and identical
+    covers (e.g. shared by several editions of a work) are only stored once.
+
+    The same file can therefore be used by several books, so covers should only be
+    deleted once no book uses them (see `Book.release_cover`). Resized versions of
+    covers are named after them rather than their own content, so they are stored
+    with the default storage instead.
+    """
+
+    def _save(self, name, content):
+        name = content_name(posixpath.dirname(name), content)
+        # identical content has already been stored under the same name
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+@contextmanager
+def cover_lock():
+    """Hold the lock shared by every process storing or deleting covers, so a cover
+    can't be deleted by `Book.release_cover` between a book storing identical
+    content (which reuses the existing file) and that book being saved. Can be
+    entered again by a thread already holding it."""
+    if getattr(_lock_state, "depth", 0):
+        _lock_state.depth += 1
+        try:
+            yield
+        finally:
+            _lock_state.depth -= 1
+        return
+
+    path = CoverStorage().path(LOCK_NAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as lock_file:
+        locks.lock(lock_file, locks.LOCK_EX)
+        _lock_state.depth = 1
+        try:
+            yield
+        finally:
+            _lock_state.depth = 0
+            locks.unlock(lock_file)
+
+
+def content_name(directory: str, content: File) -> str:
+    """Get the content addressed name of a cover to be stored in a directory, using
+    the extension of its image format if Pillow can read it."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    try:
+        content.seek(0)
+        with Image.open(content) as image:
+            extension = COVER_EXTENSIONS.get(image.format, "")
+    except (OSError, Image.DecompressionBombError):
+        extension = ""
+    return posixpath.join(
+        directory, content_hash[:2], content_hash[2:4], content_hash + extension
+    )
+
+
+def variant_name(name: str, size: str) -> str:
+    """Get the storage name of a resized version of the cover stored under the
+    provided name (e.g. `book_covers/9f/86/variants/9f86d08...-thumbnail-100.webp`),
+    which includes its height so changing the sizes gives the variants new names."""
+    directory, file_name = posixpath.split(name)
+    stem = file_name.rsplit(".", 1)[0]
+    return posixpath.join(
+        directory,
+        "variants",
+        f"{stem}-{size}-{COVER_VARIANTS[size]}.{VARIANT_EXTENSION}",
+    )
+
+
+def is_immutable(name: str) -> bool:
+    """Whether a stored file is a content addressed cover (or a resized version of
+    one), whose content will never change so it can be cached forever."""
+    return IMMUTABLE_NAME_RE.match(name) is not None
+
+
+def generate_variants(cover_file: FieldFile) -> bool:
+    """
+    Save a resized version of a stored cover for each size in `COVER_VARIANTS`,
+    replacing any that already exist.
+
+    Args:
+        cover_file: the cover file field of a book, which must have a file
+
+    Returns:
+        whether the variants were generated (False if the file isn't an image
+        Pillow can read)
+    """
+    try:
+        with cover_file.open("rb"), Image.open(cover_file) as image:
+            # lets JPEGs be decoded at a fraction of their full size, which is much
+            # faster when only small versions are needed
+            image.draft("RGB", (image.width, max(COVER_VARIANTS.values())))
+            image.load()
+            if image.mode not in ("RGB", "RGBA") or VARIANT_FORMAT == "JPEG":
+                image = image.convert("RGB")
+            # resize from the largest to the smallest size, so each variant is made
+            # from a smaller image than the original
+            for size, height in sorted(
+                COVER_VARIANTS.items(), key=lambda item: item[1], reverse=True
+            ):
+                image.thumbnail((image.width, height))
+                content = BytesIO()
+                image.save(content, VARIANT_FORMAT, quality=VARIANT_QUALITY)
+                name = variant_name(cover_file.name, size)
+                # storages give new files a different name if one already exists
+                default_storage.delete(name)
+                default_storage.save(name, ContentFile(content.getvalue()))
+    except (OSError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+def variant_url(cover_file: FieldFile, size: str) -> Optional[str]:
+    """Get the url of a resized version of a stored cover, falling back to the url of
+    the full size cover if the variant hasn't been generated, or None if there is no
+    cover."""
+    if size not in COVER_VARIANTS:
+        raise ValueError(f"{size} is not a cover variant size")
+    if not cover_file:
+        return None
+    name = variant_name(cover_file.name, size)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return cover_file.url
+
+
+def delete_cover(storage: Storage, name: str):
+    """Delete a stored cover and its resized versions."""
+    storage.delete(name)
+    for size in COVER_VARIANTS:
+        default_storage.delete(variant_name(name, size))
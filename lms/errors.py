@@ -20,6 +20,14 @@ class APINotFoundError(Error):
         super().__init__(self.message)
 
 
+class InvalidISBNError(Error):
+    """Raised when an ISBN has the wrong length or check digit."""
+
+    def __init__(self, isbn):
+        self.message = f"{isbn} is not a valid ISBN"
+        super().__init__(self.message)
+
+
 class ObjectExistsError(Error):
     """Raised when an object with a certain ID already exists."""
 
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from typing import BinaryIO, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# responses with these status codes are retried, as they are usually temporary
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter, allowing bursts of up to `burst` calls before limiting
+    calls to `rate` per second. Thread-safe.
+
+    Args:
+        rate: number of calls allowed per second on average
+        burst: maximum number of calls allowed at once
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HTTPClient:
+    """
+    Thread-safe HTTP client reusing keep-alive connections from a pool, with a timeout
+    on every request, retries with exponential backoff on temporary errors, a
+    client-side rate limit, a limit on concurrent requests per host, and counters of
+    the requests made.
+
+    Args:
+        timeout: seconds to wait for the server to connect or send data
+        retries: number of times to retry a request after a temporary error
+        backoff: seconds to wait before the first retry, doubling with each retry
+        rate_limit: average number of requests allowed per second (None for no limit)
+        host_concurrency: maximum number of concurrent requests to each host
+        pool_size: number of connections kept alive for each host
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        rate_limit: Optional[float] = None,
+        host_concurrency: int = 4,
+        pool_size: int = 10,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = (
+            RateLimiter(rate_limit, burst=host_concurrency) if rate_limit else None
+        )
+        self.host_concurrency = host_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._stats = dict(requests=0, retries=0, errors=0, latency=0.0)
+
+    def host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        """Get the semaphore limiting the number of concurrent requests to the host of
+        the provided url, creating it if it doesn't exist yet."""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self.host_concurrency
+                )
+            return self._host_semaphores[host]
+
+    def get(
+        self, url: str, params: Optional[dict] = None, stream: bool = False
+    ) -> requests.Response:
+        """
+        Send a GET request, retrying it if the server responds with a temporary error
+        or the connection fails. Could raise requests.RequestException if the request
+        still fails after the last retry.
+
+        Args:
+            url: url to request
+            params: query parameters to add to the url
+            stream: whether to leave the response body to be read by the caller
+
+        Returns:
+            the last response received (which may have an error status code)
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.monotonic()
+            response = None
+            try:
+                with self.host_semaphore(url):
+                    response = self.session.get(
+                        url, params=params, timeout=self.timeout, stream=stream
+                    )
+            except (requests.ConnectionError, requests.Timeout):
+                self._count(start, error=True)
+                if attempt >= self.retries:
+                    raise
+            else:
+                self._count(start)
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.retries
+                ):
+                    return response
+                response.close()
+
+            # wait before retrying, using the delay the server asked for if it gave one
+            delay = self.backoff * 2**attempt
+            retry_after = ""
+            if response is not None:
+                retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            with self._lock:
+                self._stats["retries"] += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> dict:
+        """Send a GET request and return the decoded JSON body (even if the response
+        has an error status code, as the OpenLibrary API returns errors as JSON). If
+        the request fails or the body isn't JSON (e.g. an empty 503 after the last
+        retry), an error in the same form is returned instead."""
+        try:
+            response = self.get(url, params)
+        except requests.RequestException as error:
+            return {"error": repr(error)}
+        try:
+            return response.json()
+        except ValueError:
+            return {"error": f"{response.status_code} response isn't JSON"}
+
+    def get_content(self, url: str) -> bytes:
+        """Send a GET request and return the body. Could raise requests.HTTPError if
+        the response has an error status code."""
+        response = self.get(url)
+        response.raise_for_status()
+        return response.content
+
+    def download(self, url: str, file: BinaryIO, chunk_size: int = 64 * 1024):
+        """Send a GET request and write the body to a file in chunks as it arrives,
+        so large bodies are never held in memory. Could raise requests.HTTPError if the
+        response has an error status code."""
+        with self.get(url, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                file.write(chunk)
+
+    def stats(self) -> dict:
+        """Get the number of requests sent, retries and connection errors, and the
+        total and average latency of the requests in seconds."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["average_latency"] = (
+            stats["latency"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
+
+    def _count(self, start: float, error: bool = False):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["latency"] += time.monotonic() - start
+            if error:
+                self._stats["errors"] += 1
+
+
+@functools.cache
+def get_client() -> HTTPClient:
+    """Get the client shared by all OpenLibrary and cover image requests, configured
+    in the settings."""
+    host_concurrency = getattr(settings, "LMS_OPENLIBRARY_HOST_CONCURRENCY", 4)
+    return HTTPClient(
+        timeout=getattr(settings, "LMS_OPENLIBRARY_TIMEOUT", 10),
+        retries=getattr(settings, "LMS_OPENLIBRARY_RETRIES", 3),
+        backoff=getattr(settings, "LMS_OPENLIBRARY_BACKOFF", 0.5),
+        rate_limit=getattr(settings, "LMS_OPENLIBRARY_RATE_LIMIT", None),
+        host_concurrency=host_concurrency,
+        pool_size=max(getattr(settings, "LMS_IMPORT_WORKERS", 8), host_concurrency),
+    )
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from lms.errors import APINotFoundError, Error, InvalidISBNError, ObjectExistsError
+from lms.models import Book, BookCopy, CoverDownloadJob, ImportJob, clean_isbn
+from lms.openlibrary import download_file
+from lms.reservations import allocate_new_copies
+from lms.signals import reservations_handled_in_bulk
+
+# number of books whose covers are downloaded before a cover download job's progress
+# is saved
+COVER_BATCH_SIZE = 50
+
+
+def import_rows(
+    rows: list[dict],
+    includes_accessions: bool,
+    on_row_done: Optional[Callable[[int, list, list], None]] = None,
+) -> tuple[list, list]:
+    """
+    Create books, and book copies if accession codes are included, from rows
+    submitted to the book import page. Every book needed is resolved at once with
+    `Book.from_isbns` first, then the book copies are created in the same order as
+    the rows, and given to waiting reservations together once they're all created.
+
+    Args:
+        rows: dicts with `isbn`, `accession` (if includes_accessions) and `error` keys
+        includes_accessions: whether to create book copies as well as books
+        on_row_done: called with the number of rows done and the errors and successes
+            so far after each row is imported, to report progress
+
+    Returns:
+        tuple of the rows that failed (with their `error` key set to the name of the
+        exception raised) and basic information about each book (copy) created
+    """
+    # accession codes that already exist will fail before any book is needed, so
+    # don't import books for the rows that use them
+    existing_accessions = set()
+    if includes_accessions:
+        existing_accessions = set(
+            str(code)
+            for code in BookCopy.objects.filter(
+                accession_code__in=[row["accession"] for row in rows]
+            ).values_list("accession_code", flat=True)
+        )
+    books = Book.from_isbns(
+        [
+            row["isbn"]
+            for row in rows
+            if not includes_accessions or row["accession"] not in existing_accessions
+        ]
+    )
+
+    errors = []
+    successes = []
+    book_copies = []
+    for rows_done, row in enumerate(rows, start=1):
+        try:
+            # existing accession codes take priority over API errors, as they would
+            # when importing a single book copy (checked again here in case a previous
+            # row used the same accession code)
+            if includes_accessions:
+                if BookCopy.objects.filter(accession_code=row["accession"]).exists():
+                    raise ObjectExistsError(row["accession"], "BookCopy")
+            book = books[clean_isbn(row["isbn"])]
+            if isinstance(book, Error):
+                raise book
+            if includes_accessions:
+                # assigned to reservations with the rest of the copies below
+                with reservations_handled_in_bulk():
+                    book_copy = BookCopy.objects.create(
+                        accession_code=row["accession"], book=book
+                    )
+                book_copies.append(book_copy)
+        except ObjectExistsError:
+            row["error"] = "ObjectExistsError"
+            errors.append(row)
+        except APINotFoundError:
+            row["error"] = "APINotFoundError"
+            errors.append(row)
+        except InvalidISBNError:
+            row["error"] = "InvalidISBNError"
+            errors.append(row)
+        else:
+            # place some basic information from each imported book into a plain
+            # python dictionary to be serialised into json
+            success = {
+                "isbn": book.isbn,
+                "edition_id": book.edition_id,
+                "title": book.title,
+                "authors": book.authors_name_string,
+            }
+            if includes_accessions:
+                success["accession"] = book_copy.accession_code
+            success["admin_url"] = reverse("admin:lms_book_change", args=(book.pk,))
+            success["site_url"] = book.get_absolute_url()
+            successes.append(success)
+
+        if on_row_done is not None:
+            on_row_done(rows_done, errors, successes)
+
+    allocate_new_copies(book_copies)
+    return errors, successes
+
+
+def run_job(job: ImportJob):
+    """Import the rows of an import job that has been claimed by a worker, saving the
+    results of each row to the job as it goes so its progress can be shown. The job
+    is marked as failed (with the error saved) if anything unexpected goes wrong."""
+
+    def save_progress(rows_done, errors, successes):
+        job.rows_done = rows_done
+        job.errors = errors
+        job.successes = successes
+        job.save(update_fields=["rows_done", "errors", "successes"])
+
+    try:
+        with job.keep_alive():
+            import_rows(job.rows, job.includes_accessions, save_progress)
+    except Exception as err:
+        job.status = ImportJob.Status.FAILED
+        job.error_message = repr(err)
+    else:
+        job.status = ImportJob.Status.DONE
+    job.finished = timezone.now()
+    job.save(update_fields=["status", "error_message", "finished"])
+
+
+def download_covers(
+    isbns: list[str], on_batch_done: Optional[Callable[[int, int, list], None]] = None
+) -> tuple[int, list]:
+    """
+    Download the covers of books from their cover_url fields, skipping books that
+    already have a cover (so running it again only downloads the covers that are
+    still missing). The covers of each batch of books are downloaded in parallel,
+    then stored one at a time.
+
+    Args:
+        isbns: isbns of the books
+        on_batch_done: called with the number of books done, the number of covers
+            downloaded and the isbns that failed so far after each batch, to report
+            progress
+
+    Returns:
+        tuple of the number of covers downloaded and the isbns of the books whose
+        covers couldn't be downloaded
+    """
+
+    def download(book: Book):
+        try:
+            return download_file(book.cover_url)
+        except requests.RequestException:
+            return None
+
+    downloaded = 0
+    failed = []
+    with ThreadPoolExecutor(
+        max_workers=getattr(settings, "LMS_IMPORT_WORKERS", 8)
+    ) as executor:
+        for start in range(0, len(isbns), COVER_BATCH_SIZE):
+            batch = isbns[start : start + COVER_BATCH_SIZE]
+            books = list(
+                Book.objects.filter(
+                    Q(cover_file="") | Q(cover_file__isnull=True), isbn__in=batch
+                ).exclude(cover_url="")
+            )
+            for book, img_temp in zip(books, executor.map(download, books)):
+                # the file is only None if the download failed or the cover isn't
+                # cached in offline mode
+                if img_temp is None:
+                    failed.append(book.isbn)
+                    continue
+                with img_temp:
+                    book.save_cover(File(img_temp))
+                downloaded += 1
+            if on_batch_done is not None:
+                on_batch_done(start + len(batch), downloaded, failed)
+    return downloaded, failed
+
+
+def run_cover_download_job(job: CoverDownloadJob):
+    """Download the covers of the books in a cover download job that has been
+    claimed by a worker, saving its progress after each batch of books. The job is
+    marked as failed (with the error saved) if anything unexpected goes wrong."""
+
+    def save_progress(books_done, downloaded, failed):
+        job.books_done = books_done
+        job.downloaded = downloaded
+        job.failed = failed
+        job.save(update_fields=["books_done", "downloaded", "failed"])
+
+    try:
+        with job.keep_alive():
+            download_covers(job.isbns, save_progress)
+    except Exception as err:
+        job.status = CoverDownloadJob.Status.FAILED
+        job.error_message = repr(err)
+    else:
+        job.status = CoverDownloadJob.Status.DONE
+    job.finished = timezone.now()
+    job.save(update_fields=["status", "error_message", "finished"])
@@ -0,0 +1,85 @@
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from lms.apicache import get_cache
+from lms.httpclient import get_client
+from lms.models import Book
+from lms.standin import StandinServer
+
+
+class Command(BaseCommand):
+    """Measure the throughput of importing books from a fixtures directory served by
+    an in-process OpenLibrary stand-in, with optional latency and errors. The books
+    are imported in a transaction that is rolled back and covers are saved to a
+    temporary directory, so the database and media files are left unchanged."""
+
+    help = "Benchmark importing books from a local OpenLibrary stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", help="directory of recorded responses")
+        parser.add_argument(
+            "--isbns",
+            nargs="+",
+            help="isbns to import (defaults to every isbn in the fixtures)",
+        )
+        parser.add_argument("--latency", type=float, default=0)
+        parser.add_argument("--error-rate", type=float, default=0)
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=None,
+            help="client rate limit in requests per second (no limit by default)",
+        )
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help="use the OpenLibrary response cache instead of disabling it",
+        )
+
+    def handle(
+        self, *args, fixtures, isbns, latency, error_rate, rate_limit, use_cache, **opts
+    ):
+        isbns = isbns or [path.stem for path in Path(fixtures).glob("isbn/*.json")]
+        server = StandinServer(fixtures, latency=latency, error_rate=error_rate)
+        server.start()
+
+        overrides = dict(
+            LMS_OPENLIBRARY_URL=server.base_url,
+            LMS_OPENLIBRARY_COVERS_URL=server.base_url,
+            LMS_OPENLIBRARY_OFFLINE=False,
+            LMS_OPENLIBRARY_RATE_LIMIT=rate_limit,
+        )
+        if not use_cache:
+            overrides["LMS_OPENLIBRARY_CACHE_DIR"] = None
+        try:
+            with TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, **overrides
+            ):
+                # use a new client and cache configured with the overridden settings
+                get_client.cache_clear()
+                get_cache.cache_clear()
+                start = time.perf_counter()
+                with transaction.atomic():
+                    results = Book.from_isbns(isbns)
+                    transaction.set_rollback(True)
+                elapsed = time.perf_counter() - start
+                stats = get_client().stats()
+        finally:
+            get_client.cache_clear()
+            get_cache.cache_clear()
+            server.shutdown()
+            server.server_close()
+
+        imported = sum(isinstance(result, Book) for result in results.values())
+        self.stdout.write(
+            f"Imported {imported} of {len(results)} isbns in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.1f} isbns/s)\n"
+            f"{stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['errors']} connection errors, "
+            f"{stats['average_latency']:.3f}s average latency"
+        )
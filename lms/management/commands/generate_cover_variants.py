@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from lms.covers import generate_variants
+from lms.models import Book
+
+
+class Command(BaseCommand):
+    """Generate the resized versions of the covers of books that were stored before
+    they were generated on download (or regenerate them all after the sizes have been
+    changed)."""
+
+    help = "Generate the resized versions of every stored book cover."
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        books = Book.objects.exclude(cover_file="").exclude(cover_file__isnull=True)
+        for book in books.iterator():
+            if generate_variants(book.cover_file):
+                generated += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Couldn't read the cover of {book.isbn}")
+        self.stdout.write(f"Generated variants of {generated} covers ({failed} failed)")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from lms.mirror import import_dump, open_dump
+
+
+class Command(BaseCommand):
+    """Import OpenLibrary editions, works and/or authors dumps (gzipped or plain,
+    either in the official tab-separated format or as JSONL) into the local mirror
+    tables, which are used to create books before falling back to the OpenLibrary API.
+    Dumps can be imported again to update the mirror."""
+
+    help = "Import OpenLibrary data dumps into the local metadata mirror."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="dump files to import")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="number of records of each type to write to the database at once",
+        )
+
+    def handle(self, *args, paths, batch_size=1000, **options):
+        # authors and works are usually in separate dumps to editions, so the order
+        # the dumps are imported in doesn't matter
+        for path in paths:
+            with open_dump(path) as dump:
+                counts = import_dump(dump, batch_size)
+            self.stdout.write(
+                f"{path}: {counts['editions']} editions, {counts['works']} works, "
+                f"{counts['authors']} authors imported ({counts['skipped']} skipped, "
+                f"{counts['invalid_isbns']} invalid isbns ignored)"
+            )
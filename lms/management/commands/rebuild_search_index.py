@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from lms.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """Refill the SQLite full-text search index from the books and authors. The
+    index is kept up to date by triggers that find its rows by the rowids of their
+    books and authors, which a VACUUM can renumber, so this should be run after
+    one."""
+
+    help = "Rebuild the full-text search index (SQLite only)."
+
+    def handle(self, *args, **options):
+        if rebuild_search_index():
+            self.stdout.write("Rebuilt the search index")
+        else:
+            self.stdout.write("Only SQLite databases have a search index to rebuild")
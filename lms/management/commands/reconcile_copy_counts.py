@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from lms.models import Book
+
+
+class Command(BaseCommand):
+    """Repair the stored copy counters of any books whose counters don't match their
+    copies, which can happen if copies, loans or reservations are changed without
+    their signals being sent (e.g. with `QuerySet.update` or directly in the
+    database)."""
+
+    help = "Recount the copies and available copies of books whose counters drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="only list the books whose counters are wrong",
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        drifted = Book.objects.with_drifted_counts()
+        for book in drifted:
+            self.stdout.write(
+                f"{book.isbn}: {book.available_count} / {book.total_count} stored, "
+                f"{book.live_available_count} / {book.live_total_count} actual"
+            )
+        if dry_run:
+            return
+        updated = Book.objects.filter(pk__in=drifted.values("pk")).update_counts()
+        self.stdout.write(f"Repaired the copy counters of {updated} books")
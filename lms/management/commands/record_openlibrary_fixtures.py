@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from lms.models import clean_isbn
+from lms.standin import record_fixtures
+
+
+class Command(BaseCommand):
+    """Record the OpenLibrary responses needed to import some isbns into a fixtures
+    directory, to be served by `run_openlibrary_standin`."""
+
+    help = "Record OpenLibrary responses for isbns into a fixtures directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", help="directory to write the responses to")
+        parser.add_argument("isbns", nargs="+")
+
+    def handle(self, *args, fixtures, isbns, **options):
+        not_found = record_fixtures([clean_isbn(isbn) for isbn in isbns], fixtures)
+        for isbn in not_found:
+            self.stderr.write(f"{isbn} not found")
+        self.stdout.write(f"Recorded {len(isbns) - len(not_found)} isbns to {fixtures}")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from lms.models import Reservation
+from lms.reservations import release_expired
+
+
+class Command(BaseCommand):
+    """Delete the reservations that weren't collected in time, passing their copies on
+    to the next reservations waiting for the same books. Meant to be run regularly
+    (e.g. daily by cron)."""
+
+    help = "Release the copies held for expired reservations to waiting reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="number of reservations to release in each transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="only report the number of expired reservations",
+        )
+
+    def handle(self, *args, batch_size=500, dry_run=False, **options):
+        if dry_run:
+            count = Reservation.objects.expired().count()
+            self.stdout.write(f"{count} expired reservations")
+            return
+        deleted, assigned = release_expired(batch_size)
+        self.stdout.write(
+            f"{deleted} expired reservations released, {assigned} waiting "
+            f"reservations assigned a copy"
+        )
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lms.outbox import send_batch
+
+
+class Command(BaseCommand):
+    """Run a dispatcher process that sends the emails added to the outbox (e.g. to
+    tell users their reservations are ready) in batches, retrying those that fail.
+    Several dispatchers can be run at once."""
+
+    help = "Run a dispatcher that sends the emails in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="exit once there are no emails due to be sent instead of waiting "
+            "for more",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="seconds to wait before checking for new emails when there are none",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="number of emails to send over each connection to the mail server",
+        )
+
+    def handle(self, *args, once=False, poll_interval=5, batch_size=100, **options):
+        while True:
+            sent, failed = send_batch(batch_size)
+            if sent or failed:
+                self.stdout.write(f"{sent} emails sent, {failed} failed")
+            if sent + failed < batch_size:
+                if once:
+                    return
+                time.sleep(poll_interval)
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lms.importer import run_cover_download_job, run_job
+from lms.models import CoverDownloadJob, ImportJob
+
+
+class Command(BaseCommand):
+    """Run a worker process that imports the jobs submitted from the book import page
+    one at a time, oldest first, and then any cover download jobs submitted from the
+    book admin. Several workers can be run at once to run several jobs in parallel."""
+
+    help = (
+        "Run a worker that imports jobs submitted from the book import page and "
+        "downloads covers for the book admin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="exit once there are no pending jobs instead of waiting for more",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2,
+            help="seconds to wait before checking for new jobs when there are none",
+        )
+
+    def handle(self, *args, once=False, poll_interval=2, **options):
+        while True:
+            # jobs left running by workers that were killed
+            for job_class in (ImportJob, CoverDownloadJob):
+                if stale := job_class.fail_stale():
+                    self.stdout.write(
+                        f"{stale} {job_class._meta.verbose_name_plural} failed after "
+                        "their worker stopped"
+                    )
+            if job := ImportJob.claim_next():
+                self.stdout.write(f"Importing job {job.id} ({len(job.rows)} rows)")
+                run_job(job)
+                self.stdout.write(
+                    f"Job {job.id} {job.status}: {len(job.successes)} imported, "
+                    f"{len(job.errors)} errors"
+                )
+            elif job := CoverDownloadJob.claim_next():
+                self.stdout.write(
+                    f"Downloading covers for job {job.id} ({len(job.isbns)} books)"
+                )
+                run_cover_download_job(job)
+                self.stdout.write(
+                    f"Job {job.id} {job.status}: {job.downloaded} covers downloaded, "
+                    f"{len(job.failed)} failed"
+                )
+            elif once:
+                return
+            else:
+                time.sleep(poll_interval)
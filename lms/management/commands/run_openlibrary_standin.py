@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from lms.standin import StandinServer
+
+
+class Command(BaseCommand):
+    """Run a local stand-in for the OpenLibrary API serving recorded responses from a
+    fixtures directory (see `record_openlibrary_fixtures`). Point the
+    LMS_OPENLIBRARY_URL and LMS_OPENLIBRARY_COVERS_URL settings at it to import books
+    without openlibrary.org."""
+
+    help = "Run a local stand-in server for the OpenLibrary API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", help="directory of recorded responses")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="seconds to wait before responding to each request",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="fraction of requests (0-1) to respond to with a 503 error",
+        )
+
+    def handle(self, *args, fixtures, host, port, latency, error_rate, **options):
+        server = StandinServer(
+            fixtures,
+            (host, port),
+            latency=latency,
+            error_rate=error_rate,
+            verbose=options["verbosity"] > 1,
+        )
+        self.stdout.write(f"Serving {fixtures} at {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
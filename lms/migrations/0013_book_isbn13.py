@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+import lms.models
+
+
+def populate_isbn13(apps, schema_editor):
+    """Set the isbn-13 form of the isbn of every existing book, validating it just as
+    `Book.save` does (so books with an invalid isbn are left without one)."""
+    Book = apps.get_model("lms", "Book")
+    books = list(Book.objects.all())
+    for book in books:
+        book.isbn13 = lms.models.canonical_isbn(book.isbn) or ""
+    Book.objects.bulk_update(books, ["isbn13"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0012_alter_historyloan_book_alter_historyloan_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="isbn13",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=13
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_isbn13, migrations.RunPython.noop),
+    ]
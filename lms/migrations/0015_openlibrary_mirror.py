@@ -0,0 +1,113 @@
+# Generated by Django 4.2.2 on 2026-10-18 13:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0014_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MirrorAuthor",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        max_length=20,
+                        primary_key=True,
+                        serialize=False,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "OL.*",
+                                message="Open library IDs should start with `OL`",
+                            )
+                        ],
+                    ),
+                ),
+                ("name", models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MirrorEdition",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        max_length=20,
+                        primary_key=True,
+                        serialize=False,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "OL.*",
+                                message="Open library IDs should start with `OL`",
+                            )
+                        ],
+                    ),
+                ),
+                (
+                    "work_id",
+                    models.CharField(
+                        max_length=20,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "OL.*",
+                                message="Open library IDs should start with `OL`",
+                            )
+                        ],
+                    ),
+                ),
+                ("title", models.TextField()),
+                (
+                    "publish_date",
+                    models.CharField(blank=True, default="", max_length=100),
+                ),
+                ("author_ids", models.JSONField(blank=True, default=list)),
+                ("cover_id", models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MirrorISBN",
+            fields=[
+                (
+                    "isbn13",
+                    models.CharField(max_length=13, primary_key=True, serialize=False),
+                ),
+                (
+                    "edition_id",
+                    models.CharField(
+                        max_length=20,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "OL.*",
+                                message="Open library IDs should start with `OL`",
+                            )
+                        ],
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MirrorWork",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        max_length=20,
+                        primary_key=True,
+                        serialize=False,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "OL.*",
+                                message="Open library IDs should start with `OL`",
+                            )
+                        ],
+                    ),
+                ),
+                ("description", models.TextField(blank=True, default="")),
+                ("author_ids", models.JSONField(blank=True, default=list)),
+            ],
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0015_openlibrary_mirror"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoverDownloadJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("started", models.DateTimeField(blank=True, null=True)),
+                ("finished", models.DateTimeField(blank=True, null=True)),
+                (
+                    "error_message",
+                    models.TextField(
+                        blank=True,
+                        default="",
+                        help_text="error that stopped the job (if failed)",
+                    ),
+                ),
+                (
+                    "isbns",
+                    models.JSONField(
+                        help_text="isbns of the books to download covers for"
+                    ),
+                ),
+                ("books_done", models.PositiveIntegerField(default=0)),
+                ("downloaded", models.PositiveIntegerField(default=0)),
+                (
+                    "failed",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="isbns of books whose covers couldn't be downloaded",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="cover_download_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created"],
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:24
+
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import Image, features
+
+import lms.covers
+
+# copies of the cover naming and resizing in lms.covers as they were when this
+# migration was written, so changing them later doesn't change what it does
+COVER_VARIANTS = {"thumbnail": 100, "card": 352, "detail": 700}
+VARIANT_FORMAT, VARIANT_EXTENSION = (
+    ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+)
+COVER_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+
+def content_name(directory, content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content_hash = digest.hexdigest()
+    try:
+        content.seek(0)
+        with Image.open(content) as image:
+            extension = COVER_EXTENSIONS.get(image.format, "")
+    except (OSError, Image.DecompressionBombError):
+        extension = ""
+    return posixpath.join(
+        directory, content_hash[:2], content_hash[2:4], content_hash + extension
+    )
+
+
+def variant_name(name, size):
+    directory, file_name = posixpath.split(name)
+    stem = file_name.rsplit(".", 1)[0]
+    return posixpath.join(
+        directory,
+        "variants",
+        f"{stem}-{size}-{COVER_VARIANTS[size]}.{VARIANT_EXTENSION}",
+    )
+
+
+def generate_variants(name):
+    try:
+        with default_storage.open(name) as file, Image.open(file) as image:
+            image.draft("RGB", (image.width, max(COVER_VARIANTS.values())))
+            image.load()
+            if image.mode not in ("RGB", "RGBA") or VARIANT_FORMAT == "JPEG":
+                image = image.convert("RGB")
+            for size, height in sorted(
+                COVER_VARIANTS.items(), key=lambda item: item[1], reverse=True
+            ):
+                image.thumbnail((image.width, height))
+                content = BytesIO()
+                image.save(content, VARIANT_FORMAT, quality=80)
+                variant = variant_name(name, size)
+                default_storage.delete(variant)
+                default_storage.save(variant, ContentFile(content.getvalue()))
+    except (OSError, Image.DecompressionBombError):
+        pass
+
+
+def move_covers(apps, schema_editor):
+    """Store every existing cover by the hash of its content, deleting the old file
+    (and its resized versions) once it has been copied."""
+    Book = apps.get_model("lms", "Book")
+    books = Book.objects.exclude(cover_file="").exclude(cover_file__isnull=True)
+    for book in books.iterator():
+        old_name = book.cover_file.name
+        if not default_storage.exists(old_name):
+            continue
+        with default_storage.open(old_name) as file:
+            new_name = content_name(posixpath.dirname(old_name), file)
+            if not default_storage.exists(new_name):
+                file.seek(0)
+                default_storage.save(new_name, file)
+        if new_name != old_name:
+            Book.objects.filter(pk=book.pk).update(cover_file=new_name)
+            default_storage.delete(old_name)
+            for size in COVER_VARIANTS:
+                default_storage.delete(variant_name(old_name, size))
+            generate_variants(new_name)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0016_coverdownloadjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="book",
+            name="cover_file",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=lms.covers.CoverStorage(),
+                upload_to="book_covers",
+            ),
+        ),
+        migrations.RunPython(move_covers, migrations.RunPython.noop),
+    ]
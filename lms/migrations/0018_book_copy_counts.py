@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counts(apps, schema_editor):
+    """Count the copies and available copies of every existing book."""
+    Book = apps.get_model("lms", "Book")
+    BookCopy = apps.get_model("lms", "BookCopy")
+
+    def copy_count(copies):
+        return Coalesce(
+            Subquery(
+                copies.filter(book=OuterRef("pk"))
+                .order_by()
+                .values("book")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+    Book.objects.update(
+        total_count=copy_count(BookCopy.objects.all()),
+        available_count=copy_count(
+            BookCopy.objects.filter(current_loan__isnull=True, reservation__isnull=True)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0017_content_addressed_covers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="available_count",
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="total_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
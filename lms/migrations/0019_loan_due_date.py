@@ -0,0 +1,37 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:37
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+
+def populate_due_dates(apps, schema_editor):
+    """Set the due date of every existing loan from its renewal date and its user's
+    loan length."""
+    Loan = apps.get_model("lms", "Loan")
+    loans = list(Loan.objects.select_related("user"))
+    for loan in loans:
+        loan.due_date = loan.renewal_date + timedelta(days=loan.user.loan_length)
+    Loan.objects.bulk_update(loans, ["due_date"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0018_book_copy_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loan",
+            name="due_date",
+            field=models.DateField(
+                db_index=True,
+                default=date.today,
+                editable=False,
+                help_text="date the loan is due back, set when the loan begins or is "
+                "renewed",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,179 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import lms.models
+
+# space separated names of the authors of the book with the isbn given as {isbn}
+BOOK_AUTHOR_NAMES = """
+    SELECT coalesce(group_concat(lms_author.name, ' '), '') FROM lms_author
+    INNER JOIN lms_book_authors ON lms_book_authors.author_id = lms_author.id
+    WHERE lms_book_authors.book_id = {isbn}
+"""
+
+CREATE_SEARCH_INDEX = [
+    # the prefix indexes make prefix queries for terms of 2 or 3 characters fast
+    """
+    CREATE VIRTUAL TABLE lms_book_fts USING fts5(
+        isbn UNINDEXED, title, description, authors,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE lms_author_fts USING fts5(
+        id UNINDEXED, name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    # rank matches in titles and author names above matches in descriptions
+    "INSERT INTO lms_book_fts (lms_book_fts, rank) "
+    "VALUES ('rank', 'bm25(0.0, 10.0, 1.0, 5.0)')",
+    """
+    INSERT INTO lms_book_fts (isbn, title, description, authors)
+    SELECT isbn, title, description, ({}) FROM lms_book
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="lms_book.isbn")
+    ),
+    "INSERT INTO lms_author_fts (id, name) SELECT id, name FROM lms_author",
+    """
+    CREATE TRIGGER lms_book_fts_insert AFTER INSERT ON lms_book BEGIN
+        INSERT INTO lms_book_fts (isbn, title, description, authors)
+        VALUES (new.isbn, new.title, new.description, '');
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_fts_update
+    AFTER UPDATE OF isbn, title, description ON lms_book BEGIN
+        UPDATE lms_book_fts
+        SET isbn = new.isbn, title = new.title, description = new.description
+        WHERE isbn = old.isbn;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_fts_delete AFTER DELETE ON lms_book BEGIN
+        DELETE FROM lms_book_fts WHERE isbn = old.isbn;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_authors_fts_insert AFTER INSERT ON lms_book_authors BEGIN
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE isbn = new.book_id;
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="new.book_id")
+    ),
+    """
+    CREATE TRIGGER lms_book_authors_fts_delete AFTER DELETE ON lms_book_authors BEGIN
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE isbn = old.book_id;
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="old.book_id")
+    ),
+    """
+    CREATE TRIGGER lms_author_fts_insert AFTER INSERT ON lms_author BEGIN
+        INSERT INTO lms_author_fts (id, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER lms_author_fts_update AFTER UPDATE OF id, name ON lms_author BEGIN
+        UPDATE lms_author_fts SET id = new.id, name = new.name WHERE id = old.id;
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE isbn IN (
+            SELECT book_id FROM lms_book_authors WHERE author_id = new.id
+        );
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="lms_book_fts.isbn")
+    ),
+    """
+    CREATE TRIGGER lms_author_fts_delete AFTER DELETE ON lms_author BEGIN
+        DELETE FROM lms_author_fts WHERE id = old.id;
+    END
+    """,
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER lms_book_fts_insert",
+    "DROP TRIGGER lms_book_fts_update",
+    "DROP TRIGGER lms_book_fts_delete",
+    "DROP TRIGGER lms_book_authors_fts_insert",
+    "DROP TRIGGER lms_book_authors_fts_delete",
+    "DROP TRIGGER lms_author_fts_insert",
+    "DROP TRIGGER lms_author_fts_update",
+    "DROP TRIGGER lms_author_fts_delete",
+    "DROP TABLE lms_book_fts",
+    "DROP TABLE lms_author_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 tables for full-text search, fill them and add the triggers
+    that keep them up to date. Other databases search without an index (see
+    `search.py`), so this only runs on SQLite."""
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in DROP_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0019_loan_due_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorSearchEntry",
+            fields=[
+                (
+                    "author",
+                    models.OneToOneField(
+                        db_column="id",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="lms.author",
+                    ),
+                ),
+                ("name", models.TextField()),
+                ("index", lms.models.FullTextIndexField(db_column="lms_author_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "lms_author_fts",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="BookSearchEntry",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        db_column="isbn",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="lms.book",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("description", models.TextField()),
+                ("authors", models.TextField()),
+                ("index", lms.models.FullTextIndexField(db_column="lms_book_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "lms_book_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0020_search_index"),
+    ]
+
+    operations = [
+        # existing reservations were made before their order was recorded, so they
+        # are all given the same time and queued in an arbitrary order
+        migrations.AddField(
+            model_name="reservation",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                help_text="when the reservation was made",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("copy__isnull", True)),
+                fields=["book", "copy", "created", "id"],
+                name="lms_reservation_queue_idx",
+            ),
+        ),
+    ]
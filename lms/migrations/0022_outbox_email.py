@@ -0,0 +1,71 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0021_reservation_queue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEmail",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("recipient", models.EmailField(max_length=254)),
+                ("subject", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="when the email will next be sent (while pending)",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("sent", models.DateTimeField(blank=True, null=True)),
+                (
+                    "error_message",
+                    models.TextField(
+                        blank=True,
+                        default="",
+                        help_text="error from the last attempt to send it",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["next_attempt"],
+                        name="lms_outboxemail_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
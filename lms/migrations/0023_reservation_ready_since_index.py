@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0022_outbox_email"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reservation",
+            name="ready_since",
+            field=models.DateField(
+                blank=True,
+                db_index=True,
+                help_text="date the reservation was ready for collection ",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0023_reservation_ready_since_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coverdownloadjob",
+            name="heartbeat",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="last time the worker running the job showed it was still running",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="heartbeat",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="last time the worker running the job showed it was still running",
+                null=True,
+            ),
+        ),
+    ]
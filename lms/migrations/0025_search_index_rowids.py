@@ -0,0 +1,142 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:05
+
+import importlib
+
+from django.db import migrations
+
+# space separated names of the authors of the book with the isbn given as {isbn}
+BOOK_AUTHOR_NAMES = """
+    SELECT coalesce(group_concat(lms_author.name, ' '), '') FROM lms_author
+    INNER JOIN lms_book_authors ON lms_book_authors.author_id = lms_author.id
+    WHERE lms_book_authors.book_id = {isbn}
+"""
+
+# the rowid of each row of the FTS tables is the rowid of its book or author, so the
+# triggers find it with a rowid lookup rather than by scanning the FTS table for the
+# isbn or id (which are unindexed)
+FILL_SEARCH_INDEX = [
+    """
+    INSERT INTO lms_book_fts (rowid, isbn, title, description, authors)
+    SELECT rowid, isbn, title, description, ({}) FROM lms_book
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="lms_book.isbn")
+    ),
+    "INSERT INTO lms_author_fts (rowid, id, name) SELECT rowid, id, name FROM lms_author",
+]
+
+CREATE_SEARCH_INDEX = [
+    # the prefix indexes make prefix queries for terms of 2 or 3 characters fast
+    """
+    CREATE VIRTUAL TABLE lms_book_fts USING fts5(
+        isbn UNINDEXED, title, description, authors,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE lms_author_fts USING fts5(
+        id UNINDEXED, name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    # rank matches in titles and author names above matches in descriptions
+    "INSERT INTO lms_book_fts (lms_book_fts, rank) "
+    "VALUES ('rank', 'bm25(0.0, 10.0, 1.0, 5.0)')",
+    *FILL_SEARCH_INDEX,
+    """
+    CREATE TRIGGER lms_book_fts_insert AFTER INSERT ON lms_book BEGIN
+        INSERT INTO lms_book_fts (rowid, isbn, title, description, authors)
+        VALUES (new.rowid, new.isbn, new.title, new.description, '');
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_fts_update
+    AFTER UPDATE OF isbn, title, description ON lms_book BEGIN
+        UPDATE lms_book_fts
+        SET isbn = new.isbn, title = new.title, description = new.description
+        WHERE rowid = new.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_fts_delete AFTER DELETE ON lms_book BEGIN
+        DELETE FROM lms_book_fts WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_book_authors_fts_insert AFTER INSERT ON lms_book_authors BEGIN
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE rowid = (SELECT rowid FROM lms_book WHERE isbn = new.book_id);
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="new.book_id")
+    ),
+    """
+    CREATE TRIGGER lms_book_authors_fts_delete AFTER DELETE ON lms_book_authors BEGIN
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE rowid = (SELECT rowid FROM lms_book WHERE isbn = old.book_id);
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="old.book_id")
+    ),
+    """
+    CREATE TRIGGER lms_author_fts_insert AFTER INSERT ON lms_author BEGIN
+        INSERT INTO lms_author_fts (rowid, id, name)
+        VALUES (new.rowid, new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER lms_author_fts_update AFTER UPDATE OF id, name ON lms_author BEGIN
+        UPDATE lms_author_fts SET id = new.id, name = new.name
+        WHERE rowid = new.rowid;
+        UPDATE lms_book_fts SET authors = ({})
+        WHERE rowid IN (
+            SELECT lms_book.rowid FROM lms_book
+            INNER JOIN lms_book_authors ON lms_book_authors.book_id = lms_book.isbn
+            WHERE lms_book_authors.author_id = new.id
+        );
+    END
+    """.format(
+        BOOK_AUTHOR_NAMES.format(isbn="lms_book_fts.isbn")
+    ),
+    """
+    CREATE TRIGGER lms_author_fts_delete AFTER DELETE ON lms_author BEGIN
+        DELETE FROM lms_author_fts WHERE rowid = old.rowid;
+    END
+    """,
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER lms_book_fts_insert",
+    "DROP TRIGGER lms_book_fts_update",
+    "DROP TRIGGER lms_book_fts_delete",
+    "DROP TRIGGER lms_book_authors_fts_insert",
+    "DROP TRIGGER lms_book_authors_fts_delete",
+    "DROP TRIGGER lms_author_fts_insert",
+    "DROP TRIGGER lms_author_fts_update",
+    "DROP TRIGGER lms_author_fts_delete",
+    "DROP TABLE lms_book_fts",
+    "DROP TABLE lms_author_fts",
+]
+
+
+def recreate_search_index(apps, schema_editor):
+    """Replace the search index of 0020_search_index with one whose rows share the
+    rowids of their books and authors."""
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in DROP_SEARCH_INDEX + CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+def restore_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        previous = importlib.import_module("lms.migrations.0020_search_index")
+        for statement in DROP_SEARCH_INDEX + previous.CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("lms", "0024_backgroundjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_index, restore_search_index),
+    ]
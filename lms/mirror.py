@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import gzip
+import json
+from collections import Counter
+from typing import Iterable, Optional
+
+from lms.models import (
+    MirrorAuthor,
+    MirrorEdition,
+    MirrorISBN,
+    MirrorWork,
+    canonical_isbn,
+)
+from lms.openlibrary import get_id_from_key
+
+
+def open_dump(path: str):
+    """Open an OpenLibrary dump file for reading as text, decompressing it if it is
+    gzipped."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def parse_dump_line(line: str) -> Optional[dict]:
+    """Get the record from a line of a dump, which is either a JSON object (JSONL) or
+    tab-separated with the JSON object in the last column (the official dump format).
+    Returns None for blank lines."""
+    line = line.strip()
+    if not line:
+        return None
+    if not line.startswith("{"):
+        line = line.rsplit("\t", 1)[-1]
+    return json.loads(line)
+
+
+def text_value(value) -> str:
+    """Get the text of a field that can either be a plain string or a `/type/text`
+    object."""
+    if isinstance(value, dict):
+        return value.get("value", "")
+    return value or ""
+
+
+class MirrorWriter:
+    """
+    Collects records from a dump and writes them to the mirror tables in batches,
+    updating any rows that already exist so dumps can be imported again to bring the
+    mirror up to date.
+
+    Args:
+        batch_size: number of records of each type to collect before writing them
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self.counts = Counter()
+        # keyed by id so a record appearing twice in a batch is only written once
+        self.authors: dict[str, MirrorAuthor] = {}
+        self.works: dict[str, MirrorWork] = {}
+        self.editions: dict[str, MirrorEdition] = {}
+        self.isbns: dict[str, MirrorISBN] = {}
+
+    def add(self, record: dict):
+        """Add a record of any type from a dump, ignoring types that aren't mirrored
+        (e.g. redirects)."""
+        record_type = record.get("type", {}).get("key")
+        if record_type == "/type/author":
+            self.add_author(record)
+        elif record_type == "/type/work":
+            self.add_work(record)
+        elif record_type == "/type/edition":
+            self.add_edition(record)
+        else:
+            self.counts["skipped"] += 1
+
+    def add_author(self, record: dict):
+        author_id = get_id_from_key(record["key"])
+        self.authors[author_id] = MirrorAuthor(
+            id=author_id, name=record.get("name", "")
+        )
+        self.counts["authors"] += 1
+        if len(self.authors) >= self.batch_size:
+            self.flush_authors()
+
+    def add_work(self, record: dict):
+        work_id = get_id_from_key(record["key"])
+        self.works[work_id] = MirrorWork(
+            id=work_id,
+            description=text_value(record.get("description")),
+            author_ids=[
+                get_id_from_key(author["author"]["key"])
+                for author in record.get("authors", [])
+                if "author" in author
+            ],
+        )
+        self.counts["works"] += 1
+        if len(self.works) >= self.batch_size:
+            self.flush_works()
+
+    def add_edition(self, record: dict):
+        # editions that don't belong to a work can't be turned into books
+        if not record.get("works"):
+            self.counts["skipped"] += 1
+            return
+        edition_id = get_id_from_key(record["key"])
+        covers = [cover for cover in record.get("covers", []) if cover and cover > 0]
+        self.editions[edition_id] = MirrorEdition(
+            id=edition_id,
+            work_id=get_id_from_key(record["works"][0]["key"]),
+            title=record.get("title", ""),
+            publish_date=record.get("publish_date", "")[:100],
+            author_ids=[
+                get_id_from_key(author["key"]) for author in record.get("authors", [])
+            ],
+            cover_id=covers[0] if covers else None,
+        )
+        for isbn in record.get("isbn_13", []) + record.get("isbn_10", []):
+            # dumps contain many malformed isbns, which the edition isn't found by
+            if isinstance(isbn, str) and (isbn13 := canonical_isbn(isbn)):
+                self.isbns[isbn13] = MirrorISBN(isbn13=isbn13, edition_id=edition_id)
+            else:
+                self.counts["invalid_isbns"] += 1
+        self.counts["editions"] += 1
+        if len(self.editions) >= self.batch_size:
+            self.flush_editions()
+
+    def flush_authors(self):
+        MirrorAuthor.objects.bulk_create(
+            self.authors.values(),
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["name"],
+        )
+        self.authors = {}
+
+    def flush_works(self):
+        MirrorWork.objects.bulk_create(
+            self.works.values(),
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["description", "author_ids"],
+        )
+        self.works = {}
+
+    def flush_editions(self):
+        MirrorEdition.objects.bulk_create(
+            self.editions.values(),
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[
+                "work_id",
+                "title",
+                "publish_date",
+                "author_ids",
+                "cover_id",
+            ],
+        )
+        MirrorISBN.objects.bulk_create(
+            self.isbns.values(),
+            update_conflicts=True,
+            unique_fields=["isbn13"],
+            update_fields=["edition_id"],
+        )
+        self.editions = {}
+        self.isbns = {}
+
+    def flush(self):
+        """Write every record that has been collected so far."""
+        self.flush_authors()
+        self.flush_works()
+        self.flush_editions()
+
+
+def import_dump(lines: Iterable[str], batch_size: int = 1000) -> Counter:
+    """
+    Stream the records from the lines of an OpenLibrary editions, works and/or
+    authors dump into the mirror tables, only holding one batch of records in memory
+    at a time.
+
+    Args:
+        lines: lines of the dump (e.g. an open dump file)
+        batch_size: number of records of each type to write at once
+
+    Returns:
+        the number of authors, works and editions imported, records skipped and
+        invalid isbns ignored
+    """
+    writer = MirrorWriter(batch_size)
+    for line in lines:
+        if (record := parse_dump_line(line)) is not None:
+            writer.add(record)
+    writer.flush()
+    return writer.counts
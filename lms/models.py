@@ -1,33 +1,50 @@
 from __future__ import annotations
 
 import datetime
+import logging
 import re
+import threading
 import uuid
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
-from tempfile import NamedTemporaryFile
-from typing import Optional
-from urllib.parse import urlparse
-from urllib.request import urlopen
+from typing import Optional, Union
 
-import datefinder
-import requests
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import AbstractUser
 from django.core.files import File
 from django.core.validators import RegexValidator
-from django.db import models
-from django.db.models import QuerySet
+from django.db import DatabaseError, connection, models, transaction
+from django.db.models import (
+    Count,
+    F,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    Window,
+)
+from django.db.models.functions import Coalesce, RowNumber
 from django.urls import reverse
+from django.utils import timezone
 from isbn_field import ISBNField
+from stdnum import isbn as stdnum_isbn
+
+from lms import covers, openlibrary
 
 from lms.errors import (
-    ObjectExistsError,
     APINotFoundError,
+    Error,
+    ObjectExistsError,
     MaxLoansError,
     MaxRenewalsError,
     BookUnavailableError,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class LibraryUser(AbstractUser):
     """Extends the generic django user model, adding fields used by the library
@@ -50,6 +67,19 @@ class LibraryUser(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name()} ({self.username})"
 
+    def queue_email(self, subject: str, message: str) -> Optional[OutboxEmail]:
+        """Add an email to the user to the outbox, to be sent by the email dispatcher
+        once the current transaction (if any) is committed. Returns None if the user
+        has no email address."""
+        if not self.email:
+            return None
+        return OutboxEmail.objects.create(
+            recipient=self.email, subject=subject, body=message
+        )
+
+
+# number of days a reservation can be collected for once a copy is assigned to it
+RESERVATION_HOLD_DAYS = 7
 
 # define common defaults for OpenLibrary ID fields to be validated off of
 ol_id_field = dict(
@@ -71,8 +101,110 @@ class Author(models.Model):
         return f"{self.name} ({self.id})"
 
 
+def copy_count_subquery(available: bool = False) -> Coalesce:
+    """Subquery counting the copies (or only the available copies, that are neither on
+    loan nor reserved) of the book in the outer query."""
+    copies = BookCopy.objects.filter(book=OuterRef("pk"))
+    if available:
+        copies = copies.filter(current_loan__isnull=True, reservation__isnull=True)
+    return Coalesce(
+        Subquery(
+            copies.order_by().values("book").annotate(count=Count("pk")).values("count")
+        ),
+        0,
+    )
+
+
+def next_available_subqueries(book_ref: str = "pk") -> dict[str, Subquery]:
+    """Subqueries getting the soonest due date of the loans of the copies of the book
+    referred to by `book_ref` in the outer query (as `next_loan_due`), and the date the
+    longest ready reservation holding one of its copies became ready (as
+    `next_reservation_ready`)."""
+    loans = Loan.objects.filter(book__book=OuterRef(book_ref)).order_by("due_date")
+    reservations = Reservation.objects.filter(
+        book=OuterRef(book_ref), copy__isnull=False, ready_since__isnull=False
+    ).order_by("ready_since")
+    return {
+        "next_loan_due": Subquery(loans.values("due_date")[:1]),
+        "next_reservation_ready": Subquery(reservations.values("ready_since")[:1]),
+    }
+
+
+def next_available_date(
+    next_loan_due: Optional[date], next_reservation_ready: Optional[date]
+) -> Optional[date]:
+    """Get the soonest date a copy of a book will be returned or have its reservation
+    expire from the dates annotated by `next_available_subqueries`, or None if no
+    copies are on loan or reserved."""
+    dates = [next_loan_due]
+    if next_reservation_ready:
+        dates.append(next_reservation_ready + timedelta(days=RESERVATION_HOLD_DAYS))
+    return min(filter(None, dates), default=None)
+
+
+class BookQuerySet(models.QuerySet):
+    """Queryset for books, with methods to fetch the data shown alongside each book in
+    lists in a fixed number of queries rather than a few for every book."""
+
+    def with_availability(self) -> BookQuerySet:
+        """Annotate each book with its number of copies and the number of them that
+        are available, counted from the copies themselves (as `live_total_count` and
+        `live_available_count`) rather than read from the stored counters."""
+        return self.annotate(
+            live_total_count=copy_count_subquery(),
+            live_available_count=copy_count_subquery(available=True),
+        )
+
+    def update_counts(self) -> int:
+        """Set the stored copy counters of the books to their actual values in a
+        single UPDATE, returning the number of books updated. Called whenever a copy,
+        loan or reservation is saved or deleted (see `signals.py`)."""
+        return self.update(
+            total_count=copy_count_subquery(),
+            available_count=copy_count_subquery(available=True),
+        )
+
+    def with_drifted_counts(self) -> BookQuerySet:
+        """Filter to the books whose stored copy counters don't match their actual
+        values (which only happens if copies, loans or reservations are changed
+        without their signals being sent, e.g. with `QuerySet.update`)."""
+        return self.with_availability().exclude(
+            total_count=F("live_total_count"),
+            available_count=F("live_available_count"),
+        )
+
+    def with_next_available(self) -> BookQuerySet:
+        """Annotate each book with the dates used by `Book.copy_next_available`, so it
+        can be shown for a list of books without querying the copies of each one."""
+        return self.annotate(**next_available_subqueries())
+
+    def with_first_author_name(self) -> BookQuerySet:
+        """Annotate each book with the alphabetically first name of its authors (as
+        `first_author_name`, an empty string if it has none), to sort books by
+        author."""
+        names = Author.objects.filter(books=OuterRef("pk")).order_by("name")
+        return self.annotate(
+            first_author_name=Coalesce(Subquery(names.values("name")[:1]), Value(""))
+        )
+
+    def with_authors(self) -> BookQuerySet:
+        """Prefetch the authors of each book."""
+        return self.prefetch_related("authors")
+
+    def with_copies(self) -> BookQuerySet:
+        """Prefetch the copies of each book, with their loans and reservations."""
+        return self.prefetch_related(
+            models.Prefetch(
+                "copies",
+                queryset=BookCopy.objects.select_related("current_loan", "reservation"),
+            )
+        )
+
+
 class Book(models.Model):
     isbn = ISBNField(primary_key=True)
+    # isbn-13 form of the isbn, so books can be found by either of their isbns
+    isbn13 = models.CharField(max_length=13, db_index=True, editable=False)
     # a certain printing or edition of a text (e.g. the first edition hardback)
     edition_id = models.CharField(**ol_id_field, unique=True)
     # the text itself, including all editions (e.g. 'Hunger Games')
@@ -86,7 +218,14 @@ class Book(models.Model):
     created = models.DateField(auto_now_add=True)
     # url to an image file of the book's cover
     cover_url = models.URLField(blank=True, default="")
-    cover_file = models.ImageField(upload_to="book_covers", null=True, blank=True)
+    # stored by content hash, so books with identical covers share the same file
+    cover_file = models.ImageField(
+        upload_to="book_covers",
+        storage=covers.CoverStorage(),
+        null=True,
+        blank=True,
+        db_index=True,
+    )
     date_published = models.DateField(blank=True, null=True, default=None)
     featured = models.BooleanField(
         blank=True,
@@ -94,6 +233,15 @@ class Book(models.Model):
         help_text="whether the book should be featured on the home page - make sure "
         "it has a cover",
     )
+    # number of copies, and of copies that are neither on loan nor reserved, kept up
+    # to date whenever a copy, loan or reservation changes so they can be read,
+    # filtered and sorted on without counting the copies
+    total_count = models.PositiveIntegerField(default=0, editable=False)
+    available_count = models.PositiveIntegerField(
+        default=0, editable=False, db_index=True
+    )
+
+    objects = BookQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created"]
@@ -101,6 +249,18 @@ class Book(models.Model):
     def __str__(self):
         return f"{self.title} ({self.edition_id})"
 
+    def save(self, *args, **kwargs):
+        self.isbn13 = canonical_isbn(self.isbn) or ""
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # a book loaded before one of its copies was loaned out, returned, etc.
+            # saves its old copy counters, so count them again
+            if update_fields is None or {"total_count", "available_count"} & set(
+                update_fields
+            ):
+                Book.objects.filter(pk=self.pk).update_counts()
+
     def get_absolute_url(self):
         return reverse("view_book", args=(self.edition_id,))
 
@@ -126,7 +286,11 @@ class Book(models.Model):
 
     @property
     def num_copies_available(self) -> int:
-        return self.available_copies.count()
+        return self.available_count
+
+    @property
+    def num_copies(self) -> int:
+        return self.total_count
 
     @property
     def other_editions(self) -> QuerySet[Book]:
@@ -138,15 +302,58 @@ class Book(models.Model):
     @property
     def copy_next_available(self) -> Optional[date]:
         """Returns the soonest due date of the copies that are currently unavailable,
-        or null if they're all available."""
-        if self.num_copies_available < self.copies.count():
-            return min(copy.due_date for copy in self.copies.all() if copy.due_date)
+        or null if they're all available. Uses the dates annotated by
+        `BookQuerySet.with_next_available` if the book has them, otherwise getting them
+        in a single query."""
+        if not hasattr(self, "next_loan_due"):
+            dates = (
+                Book.objects.filter(pk=self.pk)
+                .annotate(**next_available_subqueries())
+                .values("next_loan_due", "next_reservation_ready")
+                .get()
+            )
+            return next_available_date(**dates)
+        return next_available_date(self.next_loan_due, self.next_reservation_ready)
+
+    def cover_variant(self, size: str) -> Optional[str]:
+        """Get the url of the cover resized for where it is shown (one of the sizes in
+        `covers.COVER_VARIANTS`, e.g. 'thumbnail'), or None if there is no cover."""
+        return covers.variant_url(self.cover_file, size)
+
+    def save_cover(self, file: File, save: bool = True):
+        """Store a cover image in the cover_file field and generate its resized
+        versions, deleting the book's previous cover if no other book uses it (which
+        is only checked if the book is saved). The cover is stored and the book saved
+        under `covers.cover_lock`, which callers saving the book later should hold
+        until they do."""
+        old_name = self.cover_file.name
+        with covers.cover_lock(), transaction.atomic():
+            self.cover_file.save(self.pk, file, save=save)
+        covers.generate_variants(self.cover_file)
+        if save and old_name and old_name != self.cover_file.name:
+            Book.release_cover(old_name)
+
+    @classmethod
+    def release_cover(cls, name: str) -> bool:
+        """Delete a stored cover (and its resized versions) if no book uses it any
+        more, returning whether it was deleted. Covers are stored by content hash and
+        shared between books, so the books using a cover are counted first, under
+        the same lock as covers are stored with so a book that has just started
+        using the file is counted."""
+        if not name:
+            return False
+        with covers.cover_lock():
+            if Book.objects.filter(cover_file=name).exists():
+                return False
+            covers.delete_cover(Book.cover_file.field.storage, name)
+        return True
 
     @classmethod
     def from_isbn(cls, isbn: str) -> Book:
         """
         Get or create a Book object from an isbn, pulling any required data on the
-        book or its authors from the OpenLibrary API. Could raise APINotFoundError.
+        book or its authors from the OpenLibrary API. Could raise APINotFoundError or
+        InvalidISBNError.
 
         Args:
             isbn: isbn-10 or isbn-13 of the book
@@ -154,82 +361,179 @@ class Book(models.Model):
         Returns:
             the created Book object
         """
-        # cleans isbn to ensure it doesn't have any extra dashes, spaces, etc. that
-        # would stop the database lookup from successfully finding the existing book
-        # copy
-        isbn = clean_isbn(isbn)
-
-        # check if the book already exists, if so, simply return that
-        if (book := Book.objects.filter(isbn=isbn)).exists():
-            return book.get()
-
-        # get main book data from generic Book API and extract it into a python dict
-        r = requests.get(
-            f"https://openlibrary.org/api/books",
-            {"bibkeys": f"ISBN:{isbn}", "format": "json", "jscmd": "data"},
+        result = cls.from_isbns([isbn])[clean_isbn(isbn)]
+        if isinstance(result, Error):
+            raise result
+        return result
+
+    @classmethod
+    def from_isbns(cls, isbns: list[str]) -> dict[str, Union[Book, Error]]:
+        """
+        Get or create Book objects from a list of isbns, pulling any required data on
+        the books or their authors from the local OpenLibrary mirror, or from the
+        OpenLibrary API in as few requests as possible if they aren't in the mirror
+        (see `openlibrary.fetch_books_data`). Books are created in the order their
+        isbns are provided.
+
+        Args:
+            isbns: isbn-10s or isbn-13s of the books
+
+        Returns:
+            dict mapping each cleaned isbn to either its Book object, or the
+            InvalidISBNError/APINotFoundError explaining why it couldn't be found
+        """
+        # cleans isbns to ensure they don't have any extra dashes, spaces, etc. that
+        # would stop the database lookup from successfully finding the existing books,
+        # and converts them to isbn-13s so either isbn of a book finds it
+        isbns = list(dict.fromkeys(clean_isbn(isbn) for isbn in isbns))
+        isbn13s = {isbn: canonical_isbn(isbn) or isbn for isbn in isbns}
+
+        # get the books that already exist (by their isbn too, as books stored with an
+        # invalid isbn have no isbn-13), then get the data for the rest from the local
+        # OpenLibrary mirror or the API all at once (only fetching one isbn for each
+        # book)
+        existing = {}
+        for book in Book.objects.filter(
+            Q(isbn13__in=isbn13s.values()) | Q(isbn__in=isbns)
+        ):
+            existing[book.isbn13 or book.isbn] = book
+        to_fetch = {}
+        for isbn, isbn13 in isbn13s.items():
+            if isbn13 not in existing:
+                to_fetch.setdefault(isbn13, isbn)
+        books_data = MirrorEdition.find_books_data(
+            {isbn: isbn13 for isbn13, isbn in to_fetch.items()}
         )
-        data = r.json()
-        if f"ISBN:{isbn}" not in data:
-            raise APINotFoundError(isbn, "Book")
-        book_data = data[f"ISBN:{isbn}"]
-
-        # extract the edition id from the provided `key` field
-        edition_id = get_id_from_key(book_data["key"])
-
-        # get edition information from works API and extract it into a python dict
-        r = requests.get(f"https://openlibrary.org/books/{edition_id}.json")
-        edition_api_data = r.json()
-        if "error" in edition_api_data:
-            raise APINotFoundError(edition_id, "Book")
-
-        # extracts the work_id from the provided nested dict
-        work_id = get_id_from_key(edition_api_data["works"][0]["key"])
-
-        # get work information from works API and extract it into a python dict
-        r = requests.get(f"https://openlibrary.org/works/{work_id}.json")
-        works_api_data = r.json()
-        if "error" in works_api_data:
-            raise APINotFoundError(edition_id, "Book")
-
-        # extract information from dicts, doing any basic processing necessary
-        title = book_data["title"]
-        matches = tuple(datefinder.find_dates(book_data["publish_date"]))
-        date_published = matches[0].date() if matches else None
-        description = works_api_data.get("description", "")
-
-        # get book cover from api and save as file
-        cover = book_data.get("cover", None)
-        cover_url = cover["large"] if cover is not None else ""
-        if cover_url:
-            img_temp = NamedTemporaryFile(delete=True)
-            img_temp.write(urlopen(cover_url).read())
-            img_temp.flush()
-        # code above adapted from https://stackoverflow.com/questions/5691129/save- \
-        #   image-from-url-in-django-and-checking-if-it%C2%B4s-an-image
-
-        # create the book object
-        book = Book.objects.create(
-            isbn=isbn,
-            edition_id=edition_id,
-            work_id=work_id,
-            title=title,
-            description=description,
-            cover_url=cover_url,
-            date_published=date_published,
+        cover_files = openlibrary.download_files(
+            [book_data["cover_url"] for book_data in books_data.values()]
         )
-        # get or create its accompanying author objects
-        for author_data in book_data["authors"]:
-            author_id = get_id_from_key(author_data["url"])
-            name = author_data["name"]
-            author, _ = Author.objects.get_or_create(
-                id=author_id, defaults=dict(name=name)
+        for book_data in books_data.values():
+            book_data["cover_file"] = cover_files.get(book_data["cover_url"])
+        books_data.update(
+            openlibrary.fetch_books_data(
+                [isbn for isbn in to_fetch.values() if isbn not in books_data]
             )
-            book.authors.add(author)
-        # save book cover file
-        if cover_url:
-            book.cover_file.save(book.pk, File(img_temp))
+        )
 
-        return book
+        # the isbn may belong to an edition that is already stored under a different
+        # isbn (or is being created from another isbn), in which case that book is
+        # used, so only one book is created for each edition
+        new_books_data = {}
+        for isbn13, isbn in to_fetch.items():
+            book_data = books_data[isbn]
+            if not isinstance(book_data, Error):
+                new_books_data.setdefault(book_data["edition_id"], book_data)
+        editions = {
+            book.edition_id: book
+            for book in Book.objects.filter(edition_id__in=new_books_data.keys())
+        }
+        editions.update(
+            cls.create_from_data(
+                [
+                    book_data
+                    for edition_id, book_data in new_books_data.items()
+                    if edition_id not in editions
+                ]
+            )
+        )
+
+        results = {}
+        for isbn, isbn13 in isbn13s.items():
+            if isbn13 in existing:
+                results[isbn] = existing[isbn13]
+                continue
+            book_data = books_data[to_fetch[isbn13]]
+            if isinstance(book_data, Error):
+                results[isbn] = book_data
+            elif book_data["edition_id"] in editions:
+                results[isbn] = editions[book_data["edition_id"]]
+            else:
+                # the book conflicted with one that has since been deleted
+                results[isbn] = APINotFoundError(isbn, "Book")
+        return results
+
+    @classmethod
+    def create_from_data(cls, books_data: list[dict]) -> dict[str, Book]:
+        """
+        Create Book objects, and any of their authors that don't exist yet, from data
+        returned by `openlibrary.fetch_books_data`. The books, authors and the links
+        between them are each written in one query, however many books there are.
+        Books that have been stored since the data was fetched (e.g. by another
+        import) are used as they are instead of being created.
+
+        Args:
+            books_data: data of each book to create, in the order to create them
+
+        Returns:
+            dict mapping the edition id of each book to its new (or stored) Book
+            object, leaving out any that couldn't be created or found
+        """
+        books = [
+            Book(
+                isbn=book_data["isbn"],
+                # bulk_create doesn't call save, so this has to be set here
+                isbn13=canonical_isbn(book_data["isbn"]) or "",
+                edition_id=book_data["edition_id"],
+                work_id=book_data["work_id"],
+                title=book_data["title"],
+                description=book_data["description"],
+                cover_url=book_data["cover_url"],
+                date_published=book_data["date_published"],
+            )
+            for book_data in books_data
+        ]
+        Book.objects.bulk_create(books, ignore_conflicts=True)
+
+        # read the books back, as any with the same edition or isbn as a stored book
+        # weren't inserted, in which case the stored book is used
+        stored = Book.objects.filter(
+            Q(edition_id__in=[book.edition_id for book in books])
+            | Q(pk__in=[book.pk for book in books])
+        )
+        by_edition = {book.edition_id: book for book in stored}
+        by_isbn = {book.pk: book for book in stored}
+        results = {
+            book.edition_id: stored_book
+            for book in books
+            if (stored_book := by_edition.get(book.edition_id) or by_isbn.get(book.pk))
+        }
+        # only books of the editions in the data are given its authors and cover
+        books_data = [
+            book_data
+            for book_data in books_data
+            if book_data["edition_id"] in by_edition
+        ]
+        books = [by_edition[book_data["edition_id"]] for book_data in books_data]
+
+        # create the authors that don't exist yet (existing authors are left as they
+        # are), then link every book to its authors
+        Author.objects.bulk_create(
+            {
+                author_id: Author(id=author_id, name=name)
+                for book_data in books_data
+                for author_id, name in book_data["authors"]
+            }.values(),
+            ignore_conflicts=True,
+        )
+        Book.authors.through.objects.bulk_create(
+            [
+                Book.authors.through(book_id=book.pk, author_id=author_id)
+                for book, book_data in zip(books, books_data)
+                for author_id, _ in book_data["authors"]
+            ],
+            ignore_conflicts=True,
+        )
+
+        # save the book cover files, then store their names all at once
+        covered = []
+        with covers.cover_lock(), transaction.atomic():
+            for book, book_data in zip(books, books_data):
+                if book_data["cover_file"] is not None and not book.cover_file:
+                    book.save_cover(File(book_data["cover_file"]), save=False)
+                    covered.append(book)
+            Book.objects.bulk_update(covered, ["cover_file"])
+
+        return results
 
 
 class BookCopy(models.Model):
@@ -239,6 +543,14 @@ class BookCopy(models.Model):
     accession_code = models.PositiveIntegerField(primary_key=True)
     book = models.ForeignKey(Book, on_delete=models.PROTECT, related_name="copies")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        copy = super().from_db(db, field_names, values)
+        # remember the book the copy belonged to when it was loaded, so both books'
+        # copy counters are updated if it is moved to another book
+        copy._loaded_book_id = copy.__dict__.get("book_id")
+        return copy
+
     @property
     def unavailable(self):
         return hasattr(self, "current_loan") or hasattr(self, "reservation")
@@ -258,7 +570,7 @@ class BookCopy(models.Model):
         """
         Creates a BookCopy with the provided accession code from an isbn, pulling any
         required data on the book or its authors from the OpenLibrary API. Could raise
-        APINotFoundError or ObjectExistsError.
+        APINotFoundError, InvalidISBNError or ObjectExistsError.
 
         Args:
             isbn: isbn-10 or isbn-13 of the book
@@ -278,6 +590,17 @@ class BookCopy(models.Model):
         return book_copy
 
 
+class LoanQuerySet(models.QuerySet):
+    def overdue(self) -> LoanQuerySet:
+        """Filter to the loans that should have been returned already."""
+        return self.filter(due_date__lt=date.today())
+
+    def due_by(self, day: date) -> LoanQuerySet:
+        """Filter to the loans that are due back on or before a date (e.g. to remind
+        users whose loans are due soon)."""
+        return self.filter(due_date__lte=day)
+
+
 class Loan(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(
@@ -296,15 +619,32 @@ class Loan(models.Model):
     renewals = models.PositiveSmallIntegerField(
         blank=True, default=0, help_text="number of renewals so far"
     )
+    # stored rather than calculated when needed so loans can be filtered and sorted by
+    # it, and so it doesn't change if the user's loan length is changed mid-loan
+    due_date = models.DateField(
+        db_index=True,
+        editable=False,
+        help_text="date the loan is due back, set when the loan begins or is renewed",
+    )
 
-    @property
-    def due_date(self) -> date:
-        return self.renewal_date + timedelta(days=self.user.loan_length)
+    objects = LoanQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        loan = super().from_db(db, field_names, values)
+        # remember the renewal date and user the loan was loaded with, so the due date
+        # is only recalculated if either is changed (e.g. in the admin)
+        loan._loaded_renewal_date = loan.__dict__.get("renewal_date")
+        loan._loaded_user_id = loan.__dict__.get("user_id")
+        return loan
 
     @property
     def overdue(self):
         return self.due_date < date.today()
 
+    def calculate_due_date(self) -> date:
+        return self.renewal_date + timedelta(days=self.user.loan_length)
+
     def __str__(self):
         return (
             f"{self.book.book.title} ({self.book.accession_code}) -> {self.user.username} "
@@ -329,6 +669,17 @@ class Loan(models.Model):
         ):
             raise BookUnavailableError(self.book)
 
+        # sets the due date when the loan begins, or its renewal date or user (whose
+        # loan length it depends on) is changed
+        if (
+            self._state.adding
+            or self.renewal_date != getattr(self, "_loaded_renewal_date", None)
+            or self.user_id != getattr(self, "_loaded_user_id", None)
+        ):
+            self.due_date = self.calculate_due_date()
+            self._loaded_renewal_date = self.renewal_date
+            self._loaded_user_id = self.user_id
+
         # creates the loan
         return super().save(*args, **kwargs)
 
@@ -337,21 +688,17 @@ class Loan(models.Model):
         Return a book that a user has loaned out, adding a record of the loan to
         the history and assigning the book to any outstanding reservations.
         """
-        # adds loan to history
-        HistoryLoan.objects.create(
-            user=self.user, book=self.book, loan_date=self.loan_date
-        )
-
-        # assign book copy to reservation (if exists)
-        reservation = Reservation.objects.filter(
-            copy__isnull=True, book=self.book.book
-        ).first()
-        if reservation:
-            reservation.assign_book_copy(copy=self.book, email_on_success=True)
-            reservation.save()
+        with transaction.atomic():
+            # adds loan to history
+            HistoryLoan.objects.create(
+                user=self.user, book=self.book, loan_date=self.loan_date
+            )
 
-        # deletes the loan
-        return super().delete(*args, **kwargs)
+            # deletes the loan, then gives the copy to the reservation that has been
+            # waiting longest for the book (if there is one)
+            result = super().delete(*args, **kwargs)
+            Reservation.objects.assign_to_next(self.book, email_on_success=True)
+        return result
 
     def renew(self, force=False):
         """
@@ -364,6 +711,133 @@ class Loan(models.Model):
 
         self.renewals += 1
         self.renewal_date = date.today()
+        self.due_date = self.calculate_due_date()
+
+
+class ReservationQuerySet(models.QuerySet):
+    def waiting(self) -> ReservationQuerySet:
+        """Filter to the reservations waiting for a copy, in the order they were made
+        (the queue for each book)."""
+        return self.filter(copy__isnull=True).order_by("created", "pk")
+
+    def expired(self) -> ReservationQuerySet:
+        """Filter to the reservations that were ready for longer than they are held
+        for without being collected (see `Reservation.expired`)."""
+        cutoff = date.today() - timedelta(days=RESERVATION_HOLD_DAYS)
+        return self.filter(ready_since__lt=cutoff)
+
+    def assign_copies(self, copies: list[BookCopy]) -> list[Reservation]:
+        """
+        Assign copies that have become available (e.g. been returned in bulk or
+        freed by expired reservations) to the reservations that have been waiting
+        longest for their books in a single pass, rather than one copy at a time, and
+        queue the emails telling their users they're ready together. Copies that
+        aren't available any more are skipped.
+
+        Should be called in a transaction, which locks the copies and reservations
+        on databases that support it. Doesn't send the signals of the reservations.
+
+        Returns:
+            the reservations assigned a copy
+        """
+        available = (
+            BookCopy.objects.filter(
+                pk__in=[copy.pk for copy in copies],
+                current_loan__isnull=True,
+                reservation__isnull=True,
+            )
+            .select_for_update(of=("self",))
+            .order_by("accession_code")
+        )
+        copies_by_book = defaultdict(list)
+        for copy in available:
+            copies_by_book[copy.book_id].append(copy)
+        if not copies_by_book:
+            return []
+
+        # the front of the queue for each book, as long as the most copies of a book
+        queue = (
+            self.waiting()
+            .filter(book_id__in=copies_by_book)
+            .annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F("book"),
+                    order_by=[F("created").asc(), F("pk").asc()],
+                )
+            )
+            .filter(position__lte=max(map(len, copies_by_book.values())))
+        )
+        reservations = (
+            self.filter(pk__in=list(queue.values_list("pk", flat=True)))
+            .waiting()
+            .select_for_update(of=("self",))
+            .select_related("user", "book")
+            .prefetch_related("book__authors")
+        )
+
+        assigned = []
+        ready_since = date.today()
+        for reservation in reservations:
+            if copies_by_book[reservation.book_id]:
+                reservation.copy = copies_by_book[reservation.book_id].pop(0)
+                reservation.ready_since = ready_since
+                assigned.append(reservation)
+        self.bulk_update(assigned, ["copy", "ready_since"])
+        Book.objects.filter(pk__in={r.book_id for r in assigned}).update_counts()
+        OutboxEmail.objects.bulk_create(
+            OutboxEmail(recipient=r.user.email, subject=subject, body=message)
+            for r in assigned
+            if r.user.email
+            for subject, message in [r.ready_email()]
+        )
+        return assigned
+
+    def assign_to_next(
+        self, copy: BookCopy, email_on_success: bool = False
+    ) -> Optional[Reservation]:
+        """
+        Assign a copy that has become available (e.g. been returned) to the
+        reservation that has been waiting longest for its book, queueing an email to
+        the user letting them know it's ready if requested.
+
+        Safe to call from several processes at once (e.g. kiosks returning copies of
+        the same book): the reservation is only assigned the copy if it is still
+        waiting, otherwise the next reservation in the queue is tried, so a
+        reservation can never be assigned two copies.
+
+        Returns:
+            the reservation the copy was assigned to, or None if no reservations are
+            waiting for the book or the copy isn't available
+        """
+        while True:
+            with transaction.atomic():
+                available = BookCopy.objects.filter(
+                    pk=copy.pk, current_loan__isnull=True, reservation__isnull=True
+                )
+                if not available.exists():
+                    return None
+                # locks the head of the queue on databases that support it, skipping
+                # reservations another process is assigning a copy to
+                reservation = (
+                    self.waiting()
+                    .filter(book_id=copy.book_id)
+                    .select_for_update(skip_locked=True)
+                    .first()
+                )
+                if reservation is None:
+                    return None
+                ready_since = date.today()
+                if self.filter(pk=reservation.pk, copy__isnull=True).update(
+                    copy=copy, ready_since=ready_since
+                ):
+                    reservation.copy, reservation.ready_since = copy, ready_since
+                    # update() doesn't send the signal that keeps the copy counters
+                    # up to date
+                    Book.objects.filter(pk=copy.book_id).update_counts()
+                    if email_on_success:
+                        reservation.queue_ready_email()
+                    return reservation
 
 
 class Reservation(models.Model):
@@ -385,6 +859,7 @@ class Reservation(models.Model):
     ready_since = models.DateField(
         blank=True,
         null=True,
+        db_index=True,
         help_text="date the reservation was ready for collection ",
     )
     off_shelves = models.BooleanField(
@@ -394,6 +869,25 @@ class Reservation(models.Model):
         "the shelves and put in the reserved "
         "section",
     )
+    # reservations waiting for a copy of a book are given one in the order they were
+    # made
+    created = models.DateTimeField(
+        auto_now_add=True, help_text="when the reservation was made"
+    )
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # the queue of reservations waiting for a copy of each book, in order
+            # (copy is included, although it is always null, so SQLite prefers this
+            # index to the unique index on copy)
+            models.Index(
+                fields=["book", "copy", "created", "id"],
+                condition=Q(copy__isnull=True),
+                name="lms_reservation_queue_idx",
+            )
+        ]
 
     def __str__(self):
         return f"{self.book.title} ({self.book.edition_id}) -> {self.user.username}"
@@ -405,12 +899,12 @@ class Reservation(models.Model):
     @property
     def expiry_date(self) -> Optional[date]:
         if self.ready_since:
-            return self.ready_since + timedelta(days=7)
+            return self.ready_since + timedelta(days=RESERVATION_HOLD_DAYS)
 
     @property
     def days_to_collect(self) -> Optional[int]:
         if self.ready_since:
-            days_left = 7 - (date.today() - self.ready_since).days
+            days_left = RESERVATION_HOLD_DAYS - (date.today() - self.ready_since).days
             return days_left
 
     @property
@@ -423,7 +917,7 @@ class Reservation(models.Model):
     ) -> Optional[bool]:
         """
         If one is available, assigns a book copy to the reservation (if it doesn't
-        already have one), sending an email to the user letting them know their
+        already have one), queueing an email to the user letting them know their
         reservation is ready if requested. Doesn't call self.save(). Returns bool
         based on whether a book copy was assigned.
         """
@@ -435,29 +929,39 @@ class Reservation(models.Model):
         if copy:
             self.copy = copy
         else:
-            # returns False (book copy not assigned) if there are no copies available
-            if self.book.num_copies_available == 0:
+            # gets the first available book copy and assigns it to this reservation,
+            # returning False (book copy not assigned) if there are no copies available
+            copy = self.book.available_copies.first()
+            if copy is None:
                 return False
-            # gets the first available book copy and assigns it to this reservation
-            self.copy = self.book.available_copies.first()
+            self.copy = copy
         self.ready_since = datetime.now()  # sets the ready since property to now
 
-        # sends an email to the user telling them they can pick up their reservation
+        # queues an email to the user telling them they can pick up their reservation
         # (usually only done if there wasn't initially a copy available for their
         # reservation)
         if email_on_success:
-            self.user.email_user(
-                subject="Reservation ready for collection",
-                message=f"The book you reserved, {self.book.title} by "
-                f"{self.book.authors_name_string} is available to be collected from "
-                f"the library. It will be held for you for seven days, before being "
-                f"returned to the shelves. More information can be viewed on your "
-                f"account page on the library website.",
-                fail_silently=False,
-            )
+            self.queue_ready_email()
 
         return True  # indicates a copy was assigned
 
+    def queue_ready_email(self):
+        """Queue an email to the user telling them they can pick up their
+        reservation."""
+        self.user.queue_email(*self.ready_email())
+
+    def ready_email(self) -> tuple[str, str]:
+        """Get the subject and message of the email telling the user they can pick up
+        their reservation."""
+        return (
+            "Reservation ready for collection",
+            f"The book you reserved, {self.book.title} by "
+            f"{self.book.authors_name_string} is available to be collected from "
+            f"the library. It will be held for you for seven days, before being "
+            f"returned to the shelves. More information can be viewed on your "
+            f"account page on the library website.",
+        )
+
 
 class HistoryLoan(models.Model):
     user = models.ForeignKey(
@@ -482,11 +986,369 @@ class HistoryLoan(models.Model):
         return self.returned_date - self.loan_date
 
 
-def get_id_from_key(key_path: str, index: int = 2):
-    """Extract OL IDs from the 'key' fields returned by the API."""
-    return urlparse(key_path).path.split("/")[index]
+class BackgroundJob(models.Model):
+    """Base for jobs that are run by a worker process (`manage.py run_import_worker`)
+    rather than in the request that submits them, storing their progress so it can be
+    shown while they run."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    heartbeat = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="last time the worker running the job showed it was still running",
+    )
+    finished = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(
+        blank=True, default="", help_text="error that stopped the job (if failed)"
+    )
+
+    class Meta:
+        abstract = True
+        ordering = ["created"]
+
+    @classmethod
+    def claim_next(cls) -> Optional[BackgroundJob]:
+        """Mark the oldest pending job as running and return it, or return None if
+        there are no pending jobs. Safe to call from several worker processes at
+        once, as a job is only claimed if its status is still pending when it is
+        updated."""
+        while job := cls.objects.filter(status=cls.Status.PENDING).first():
+            now = timezone.now()
+            claimed = cls.objects.filter(pk=job.pk, status=cls.Status.PENDING).update(
+                status=cls.Status.RUNNING, started=now, heartbeat=now
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+        return None
+
+    @classmethod
+    def fail_stale(cls) -> int:
+        """Mark the running jobs whose worker hasn't shown it's still running them
+        for longer than the `LMS_JOB_TIMEOUT` setting (e.g. because it was killed) as
+        failed, so they stop being shown as in progress. Returns the number of jobs
+        marked."""
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=getattr(settings, "LMS_JOB_TIMEOUT", 300))
+        return cls.objects.filter(
+            Q(heartbeat__lt=cutoff) | Q(heartbeat__isnull=True, started__lt=cutoff),
+            status=cls.Status.RUNNING,
+        ).update(
+            status=cls.Status.FAILED,
+            finished=now,
+            error_message="the worker running the job stopped responding",
+        )
+
+    @contextmanager
+    def keep_alive(self):
+        """Update the job's heartbeat from a background thread while it runs (a few
+        times within each `LMS_JOB_TIMEOUT`), so it isn't failed by `fail_stale`
+        however long a single step of it takes."""
+        interval = getattr(settings, "LMS_JOB_TIMEOUT", 300) / 5
+        stopped = threading.Event()
+
+        def beat():
+            try:
+                while not stopped.wait(interval):
+                    try:
+                        type(self).objects.filter(
+                            pk=self.pk, status=self.Status.RUNNING
+                        ).update(heartbeat=timezone.now())
+                    except DatabaseError:
+                        # keep beating, as a missed heartbeat only matters if the
+                        # database stays unreachable for the whole timeout
+                        logger.exception("Failed to update heartbeat of %s", self)
+                        # reconnect for the next heartbeat if the connection broke
+                        connection.close()
+            finally:
+                # each thread has its own database connection
+                connection.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+
+class ImportJob(BackgroundJob):
+    """A list of rows from the book import page waiting to be (or being) imported by
+    a worker process, storing the results of each row as it is imported so the page
+    can show the job's progress."""
+
+    user = models.ForeignKey(
+        LibraryUser,
+        on_delete=models.SET_NULL,
+        related_name="import_jobs",
+        null=True,
+        blank=True,
+    )
+    includes_accessions = models.BooleanField(
+        help_text="whether book copies are created as well as books"
+    )
+    rows = models.JSONField(help_text="isbns (and accession codes) to import")
+    rows_done = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(
+        default=list, blank=True, help_text="rows that couldn't be imported"
+    )
+    successes = models.JSONField(
+        default=list, blank=True, help_text="information on each book (copy) created"
+    )
+
+    def __str__(self):
+        return f"{self.id} ({self.status}, {self.rows_done}/{len(self.rows)} rows)"
+
+
+class CoverDownloadJob(BackgroundJob):
+    """Books selected in the admin to have their covers downloaded from their
+    cover_url by a worker process, storing how many have been done so the admin can
+    show the job's progress."""
+
+    user = models.ForeignKey(
+        LibraryUser,
+        on_delete=models.SET_NULL,
+        related_name="cover_download_jobs",
+        null=True,
+        blank=True,
+    )
+    isbns = models.JSONField(help_text="isbns of the books to download covers for")
+    books_done = models.PositiveIntegerField(default=0)
+    downloaded = models.PositiveIntegerField(default=0)
+    failed = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="isbns of books whose covers couldn't be downloaded",
+    )
+
+    def __str__(self):
+        return f"{self.id} ({self.status}, {self.books_done}/{len(self.isbns)} books)"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent (or that has been sent) by the email dispatcher
+    (`manage.py run_email_dispatcher`, see `outbox.py`). Emails are added in the same
+    transaction as the change they are about, so they are only sent if it is
+    committed, and a slow or failing mail server doesn't hold up or break the request
+    making the change.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        SENT = "sent"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        help_text="when the email will next be sent (while pending)",
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    sent = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(
+        blank=True, default="", help_text="error from the last attempt to send it"
+    )
+
+    class Meta:
+        ordering = ["created"]
+        indexes = [
+            models.Index(
+                fields=["next_attempt"],
+                condition=Q(status="pending"),
+                name="lms_outboxemail_pending_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+
+
+class FullTextMatch(models.Lookup):
+    """`match` lookup filtering the rows of an SQLite FTS5 table to those matching a
+    full-text query (see `search.fts_query`)."""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+class FullTextIndexField(models.TextField):
+    """The hidden column of an SQLite FTS5 table that is named after the table, which
+    searches all of its columns when filtered with the `match` lookup."""
+
+
+FullTextIndexField.register_lookup(FullTextMatch)
+
+
+class BookSearchEntry(models.Model):
+    """
+    Row of the SQLite FTS5 full-text index of the title, description and author names
+    of each book, searched by `search.search_books`. The table is created and kept up
+    to date by triggers on the book, author and book author tables (see migration
+    0020), so it only exists when using SQLite.
+    """
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="isbn",
+        related_name="search_entry",
+    )
+    title = models.TextField()
+    description = models.TextField()
+    authors = models.TextField()
+    index = FullTextIndexField(db_column="lms_book_fts")
+    # bm25 relevance of the row to the query it is matched against (lower is better)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "lms_book_fts"
+
+
+class AuthorSearchEntry(models.Model):
+    """Row of the SQLite FTS5 full-text index of the name of each author, searched by
+    `search.search_authors` (see `BookSearchEntry`)."""
+
+    author = models.OneToOneField(
+        Author,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="id",
+        related_name="search_entry",
+    )
+    name = models.TextField()
+    index = FullTextIndexField(db_column="lms_author_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "lms_author_fts"
+
+
+class MirrorAuthor(models.Model):
+    """An author from an OpenLibrary data dump (see `manage.py
+    import_openlibrary_dump`)."""
+
+    id = models.CharField(primary_key=True, **ol_id_field)
+    name = models.TextField()
+
+
+class MirrorWork(models.Model):
+    """A work from an OpenLibrary data dump."""
+
+    id = models.CharField(primary_key=True, **ol_id_field)
+    description = models.TextField(blank=True, default="")
+    author_ids = models.JSONField(default=list, blank=True)
+
+
+class MirrorEdition(models.Model):
+    """An edition from an OpenLibrary data dump, used to create books without calling
+    the OpenLibrary API."""
+
+    id = models.CharField(primary_key=True, **ol_id_field)
+    work_id = models.CharField(**ol_id_field)
+    title = models.TextField()
+    publish_date = models.CharField(max_length=100, blank=True, default="")
+    # authors are often only listed on the edition's work
+    author_ids = models.JSONField(default=list, blank=True)
+    cover_id = models.BigIntegerField(blank=True, null=True)
+
+    @classmethod
+    def find_books_data(cls, isbns: dict[str, str]) -> dict[str, dict]:
+        """
+        Get the data needed to create Book objects from the mirror tables, in the
+        same format as `openlibrary.fetch_books_data`, except that the cover file
+        isn't downloaded. Isbns whose edition, work or authors aren't all in the
+        mirror are left out.
+
+        Args:
+            isbns: dict mapping cleaned isbns to their isbn-13 forms
+
+        Returns:
+            dict mapping each isbn found to its data
+        """
+        edition_ids = dict(
+            MirrorISBN.objects.filter(isbn13__in=isbns.values()).values_list(
+                "isbn13", "edition_id"
+            )
+        )
+        editions = MirrorEdition.objects.in_bulk(set(edition_ids.values()))
+        works = MirrorWork.objects.in_bulk({e.work_id for e in editions.values()})
+        authors = MirrorAuthor.objects.in_bulk(
+            {
+                author_id
+                for model in [*editions.values(), *works.values()]
+                for author_id in model.author_ids
+            }
+        )
+
+        results = {}
+        for isbn, isbn13 in isbns.items():
+            edition = editions.get(edition_ids.get(isbn13))
+            work = works.get(edition.work_id) if edition else None
+            if work is None:
+                continue
+            author_ids = edition.author_ids or work.author_ids
+            if not author_ids or any(a not in authors for a in author_ids):
+                continue
+            results[isbn] = {
+                "isbn": isbn,
+                "edition_id": edition.id,
+                "work_id": work.id,
+                "title": edition.title,
+                "description": work.description,
+                "cover_url": openlibrary.cover_url_from_id(edition.cover_id)
+                if edition.cover_id
+                else "",
+                "date_published": openlibrary.parse_publish_date(edition.publish_date),
+                "authors": [(a, authors[a].name) for a in author_ids],
+                "cover_file": None,
+            }
+        return results
+
+
+class MirrorISBN(models.Model):
+    """Index of the isbn-13s of the editions in the mirror tables."""
+
+    isbn13 = models.CharField(primary_key=True, max_length=13)
+    edition_id = models.CharField(**ol_id_field)
+
+
+def canonical_isbn(isbn: str) -> Optional[str]:
+    """Get the isbn-13 form of an isbn-10 or isbn-13 (cleaning it first), or None if
+    it isn't a valid isbn of either length."""
+    isbn = clean_isbn(isbn)
+    if len(isbn) not in (10, 13) or not stdnum_isbn.is_valid(isbn):
+        return None
+    return stdnum_isbn.to_isbn13(isbn)
 
 
 def clean_isbn(isbn):
-    """Remove non-numeric characters (usually dashes) from the input ISBN."""
-    return re.sub(r"\D+", r"", isbn)
+    """Remove non-numeric characters (usually dashes) from the input ISBN, keeping
+    the 'X' check digit ISBN-10s can end with."""
+    return re.sub(r"[^0-9X]+", r"", isbn.upper())
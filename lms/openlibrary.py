@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from tempfile import NamedTemporaryFile
+from typing import Optional, Union
+from urllib.parse import urlparse
+
+import datefinder
+import requests
+from django.conf import settings
+from stdnum import isbn as stdnum_isbn
+
+from lms.apicache import get_cache
+from lms.errors import APINotFoundError, Error, InvalidISBNError
+from lms.httpclient import get_client
+
+OPENLIBRARY_URL = "https://openlibrary.org"
+COVERS_URL = "https://covers.openlibrary.org"
+# maximum number of isbns looked up with each request to the generic Books API
+BIBKEYS_BATCH_SIZE = 50
+# maximum number of isbns remembered as not found when the response cache is disabled
+NOT_FOUND_MAX_SIZE = 10_000
+
+# when each isbn was last found not to be in the Books API, kept in memory if the
+# response cache is disabled
+_not_found: dict[str, float] = {}
+_not_found_lock = threading.Lock()
+
+
+def openlibrary_url() -> str:
+    """Base url of the OpenLibrary API, which can be pointed at a local stand-in
+    server in the settings (see `manage.py run_openlibrary_standin`)."""
+    return getattr(settings, "LMS_OPENLIBRARY_URL", OPENLIBRARY_URL)
+
+
+def covers_url() -> str:
+    """Base url of the OpenLibrary covers API."""
+    return getattr(settings, "LMS_OPENLIBRARY_COVERS_URL", COVERS_URL)
+
+
+def is_offline() -> bool:
+    """Whether requests should only be served from the response cache."""
+    return getattr(settings, "LMS_OPENLIBRARY_OFFLINE", False)
+
+
+def get_json(url: str, params: Optional[dict] = None) -> dict:
+    """Send a GET request to the provided url with the shared HTTP client and return
+    the decoded JSON body."""
+    return get_client().get_json(url, params)
+
+
+def get_cached_json(kind: str, key: str, url: str) -> dict:
+    """Get the decoded JSON body of the provided url from the response cache, sending
+    a GET request and caching the response (unless it is an error) if it isn't
+    there. In offline mode, an error response is returned instead of sending the
+    request."""
+    cache = get_cache()
+    if cache is not None and (content := cache.get(kind, key)) is not None:
+        return json.loads(content)
+    if is_offline():
+        return {"error": "notfound in offline cache"}
+
+    data = get_json(url)
+    if cache is not None and "error" not in data:
+        cache.set(kind, key, json.dumps(data).encode())
+    return data
+
+
+def download_file(url: str) -> Optional[NamedTemporaryFile]:
+    """Download the file at the provided url (or copy it from the response cache)
+    into a temporary file in chunks, which is deleted when closed. Returns None in
+    offline mode if the file isn't cached."""
+    cache = get_cache()
+    key = hashlib.sha256(url.encode()).hexdigest()
+    cached_file = cache.open("file", key) if cache is not None else None
+    if cached_file is None and is_offline():
+        return None
+
+    img_temp = NamedTemporaryFile(delete=True)
+    if cached_file is not None:
+        with cached_file:
+            shutil.copyfileobj(cached_file, img_temp)
+    else:
+        get_client().download(url, img_temp)
+        if cache is not None:
+            img_temp.seek(0)
+            cache.set_file("file", key, img_temp)
+    img_temp.flush()
+    img_temp.seek(0)
+    # code above adapted from https://stackoverflow.com/questions/5691129/save- \
+    #   image-from-url-in-django-and-checking-if-it%C2%B4s-an-image
+    return img_temp
+
+
+def is_known_not_found(isbn: str) -> bool:
+    """Whether the isbn was recently confirmed not to be in the Books API, according
+    to the negative entries in the response cache (or in the memory of this process
+    if the cache is disabled)."""
+    ttl = getattr(settings, "LMS_OPENLIBRARY_NEGATIVE_CACHE_TTL", 60 * 60 * 24)
+    if (cache := get_cache()) is not None:
+        return cache.get("notfound", isbn, ttl=ttl) is not None
+    with _not_found_lock:
+        return time.time() < _not_found.get(isbn, float("-inf")) + ttl
+
+
+def remember_not_found(isbns: list[str]):
+    """Remember that isbns aren't in the Books API, in the response cache or in the
+    memory of this process if the cache is disabled (forgetting the oldest isbns
+    once `NOT_FOUND_MAX_SIZE` are remembered)."""
+    if (cache := get_cache()) is not None:
+        for isbn in isbns:
+            cache.set("notfound", isbn, b"")
+        return
+    with _not_found_lock:
+        for isbn in isbns:
+            # re-inserted so the dict stays in the order the isbns were looked up
+            _not_found.pop(isbn, None)
+            _not_found[isbn] = time.time()
+        while len(_not_found) > NOT_FOUND_MAX_SIZE:
+            del _not_found[next(iter(_not_found))]
+
+
+def fetch_books_api_batch(isbns: list[str]) -> dict:
+    """Get the generic Books API data for several isbns with a single request,
+    returning a dict mapping each isbn found to its data and caching each one (and
+    remembering the isbns that weren't found in the negative cache)."""
+    data = get_json(
+        f"{openlibrary_url()}/api/books",
+        {
+            "bibkeys": ",".join(f"ISBN:{isbn}" for isbn in isbns),
+            "format": "json",
+            "jscmd": "data",
+        },
+    )
+    if "error" in data:
+        # the isbns may exist, so they aren't remembered as not found
+        return {}
+    results = {isbn: data[f"ISBN:{isbn}"] for isbn in isbns if f"ISBN:{isbn}" in data}
+
+    if (cache := get_cache()) is not None:
+        for isbn, book_data in results.items():
+            cache.set("isbn", isbn, json.dumps(book_data).encode())
+    remember_not_found([isbn for isbn in isbns if isbn not in results])
+    return results
+
+
+def fetch_edition_api_data(edition_id: str) -> dict:
+    """Get the data on an edition from the editions API."""
+    return get_cached_json(
+        "edition", edition_id, f"{openlibrary_url()}/books/{edition_id}.json"
+    )
+
+
+def fetch_work_api_data(work_id: str) -> dict:
+    """Get the data on a work from the works API."""
+    return get_cached_json("work", work_id, f"{openlibrary_url()}/works/{work_id}.json")
+
+
+def fetch_books_data(isbns: list[str]) -> dict[str, Union[dict, Error]]:
+    """
+    Pull all the data needed to create Book objects from a list of isbns from the
+    OpenLibrary API, without touching the database. The isbns are resolved with as
+    few multi-key Books API requests as possible, then each distinct edition, work
+    and cover is fetched once, with requests being made in parallel by a pool of
+    worker threads. Responses are served from the response cache where possible, and
+    isbns with invalid check digits or that were recently not found aren't requested
+    at all.
+
+    Args:
+        isbns: cleaned isbn-10s or isbn-13s
+
+    Returns:
+        dict mapping each isbn to either its data (a dict of Book field values, plus
+        an `authors` list of (id, name) tuples and a `cover_file` temporary file or
+        None) or the InvalidISBNError/APINotFoundError explaining why it couldn't be
+        found
+    """
+    isbns = list(dict.fromkeys(isbns))
+    if not isbns:
+        return {}
+
+    # reject invalid isbns and isbns that are known not to exist before making any
+    # requests
+    results = {}
+    for isbn in isbns:
+        if not stdnum_isbn.is_valid(isbn):
+            results[isbn] = InvalidISBNError(isbn)
+        elif is_known_not_found(isbn):
+            results[isbn] = APINotFoundError(isbn, "Book")
+    isbns = [isbn for isbn in isbns if isbn not in results]
+
+    # get main book data from the response cache where possible, leaving the rest to
+    # be requested from the generic Book API (unless in offline mode)
+    books_api_data = {}
+    if (cache := get_cache()) is not None:
+        for isbn in isbns:
+            if (content := cache.get("isbn", isbn)) is not None:
+                books_api_data[isbn] = json.loads(content)
+    uncached_isbns = (
+        [] if is_offline() else [isbn for isbn in isbns if isbn not in books_api_data]
+    )
+    batches = [
+        uncached_isbns[i : i + BIBKEYS_BATCH_SIZE]
+        for i in range(0, len(uncached_isbns), BIBKEYS_BATCH_SIZE)
+    ]
+
+    with ThreadPoolExecutor(
+        max_workers=getattr(settings, "LMS_IMPORT_WORKERS", 8)
+    ) as executor:
+        # get the rest of the main book data in as few requests as possible
+        for batch_data in executor.map(fetch_books_api_batch, batches):
+            books_api_data.update(batch_data)
+
+        # extract the edition ids from the provided `key` fields and get the edition
+        # information of each distinct edition from the editions API
+        edition_ids = {
+            isbn: get_id_from_key(book_data["key"])
+            for isbn, book_data in books_api_data.items()
+        }
+        distinct_edition_ids = list(dict.fromkeys(edition_ids.values()))
+        editions_api_data = dict(
+            zip(
+                distinct_edition_ids,
+                executor.map(fetch_edition_api_data, distinct_edition_ids),
+            )
+        )
+
+        # extract the work ids from the provided nested dicts and get the work
+        # information of each distinct work from the works API
+        work_ids = {
+            edition_id: get_id_from_key(edition_api_data["works"][0]["key"])
+            for edition_id, edition_api_data in editions_api_data.items()
+            if "error" not in edition_api_data
+        }
+        distinct_work_ids = list(dict.fromkeys(work_ids.values()))
+        works_api_data = dict(
+            zip(
+                distinct_work_ids,
+                executor.map(fetch_work_api_data, distinct_work_ids),
+            )
+        )
+
+    # get each distinct book cover from api and save as file
+    cover_urls = {
+        isbn: book_data["cover"]["large"] if "cover" in book_data else ""
+        for isbn, book_data in books_api_data.items()
+    }
+    cover_files = download_files(list(cover_urls.values()))
+
+    for isbn in isbns:
+        if isbn not in books_api_data:
+            results[isbn] = APINotFoundError(isbn, "Book")
+            continue
+        book_data = books_api_data[isbn]
+        edition_id = edition_ids[isbn]
+        if edition_id not in work_ids:
+            results[isbn] = APINotFoundError(edition_id, "Book")
+            continue
+        work_id = work_ids[edition_id]
+        if "error" in works_api_data[work_id]:
+            results[isbn] = APINotFoundError(edition_id, "Book")
+            continue
+
+        # extract information from dicts, doing any basic processing necessary
+        cover_url = cover_urls[isbn]
+        results[isbn] = {
+            "isbn": isbn,
+            "edition_id": edition_id,
+            "work_id": work_id,
+            "title": book_data["title"],
+            "description": works_api_data[work_id].get("description", ""),
+            "cover_url": cover_url,
+            "date_published": parse_publish_date(book_data["publish_date"]),
+            "authors": [
+                (get_id_from_key(author_data["url"]), author_data["name"])
+                for author_data in book_data["authors"]
+            ],
+            # the cover file is None if it couldn't be downloaded (or isn't cached in
+            # offline mode)
+            "cover_file": cover_files.get(cover_url),
+        }
+
+    return results
+
+
+def download_files(urls: list[str]) -> dict[str, Optional[NamedTemporaryFile]]:
+    """Download each distinct (non-empty) url in parallel with `download_file`,
+    returning a dict mapping each url to its temporary file, or None if it couldn't
+    be downloaded (so the books using it are imported without a cover)."""
+    urls = list(dict.fromkeys(filter(None, urls)))
+    if not urls:
+        return {}
+
+    def download(url: str) -> Optional[NamedTemporaryFile]:
+        try:
+            return download_file(url)
+        except requests.RequestException:
+            return None
+
+    with ThreadPoolExecutor(
+        max_workers=getattr(settings, "LMS_IMPORT_WORKERS", 8)
+    ) as executor:
+        return dict(zip(urls, executor.map(download, urls)))
+
+
+def parse_publish_date(publish_date: str) -> Optional[date]:
+    """Get the date from a free-text publish date (e.g. 'Jan 1986'), or None if it
+    doesn't contain one."""
+    matches = tuple(datefinder.find_dates(publish_date))
+    return matches[0].date() if matches else None
+
+
+def cover_url_from_id(cover_id: int) -> str:
+    """Get the url of the large version of a cover from its OpenLibrary cover id."""
+    return f"{covers_url()}/b/id/{cover_id}-L.jpg"
+
+
+def get_id_from_key(key_path: str, index: int = 2):
+    """Extract OL IDs from the 'key' fields returned by the API."""
+    return urlparse(key_path).path.split("/")[index]
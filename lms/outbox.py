@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from lms.models import OutboxEmail
+
+# seconds a dispatcher has to send the emails it claims before they can be claimed by
+# another dispatcher (e.g. if the first one crashed)
+CLAIM_TIMEOUT = 5 * 60
+
+
+def claim_batch(batch_size: int) -> list[OutboxEmail]:
+    """Claim the pending emails that are due to be sent, oldest first, by moving
+    their next attempt past the claim timeout. Safe to call from several dispatchers
+    at once, as an email is only claimed if it is still due when it is updated."""
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(
+        status=OutboxEmail.Status.PENDING, next_attempt__lte=now
+    )
+    ids = list(due.order_by("next_attempt").values_list("pk", flat=True)[:batch_size])
+    # the claim time identifies the emails claimed by this call
+    claimed_until = now + timedelta(seconds=CLAIM_TIMEOUT)
+    due.filter(pk__in=ids).update(next_attempt=claimed_until)
+    return list(OutboxEmail.objects.filter(pk__in=ids, next_attempt=claimed_until))
+
+
+def send_batch(batch_size: int = 100) -> tuple[int, int]:
+    """
+    Send a batch of the emails in the outbox over a single connection to the mail
+    server. Emails that can't be sent are retried with exponential backoff (from
+    the `LMS_EMAIL_BACKOFF` setting), up to `LMS_EMAIL_RETRIES` times.
+
+    Args:
+        batch_size: maximum number of emails to send
+
+    Returns:
+        the number of emails sent, and the number that couldn't be sent
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        # nothing can be sent without a connection
+        for email in emails:
+            record_failure(email, error)
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(
+                    email.subject,
+                    email.body,
+                    to=[email.recipient],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as error:
+                    record_failure(email, error)
+                else:
+                    email.status = OutboxEmail.Status.SENT
+                    email.sent = timezone.now()
+                    email.attempts += 1
+                    sent += 1
+        finally:
+            connection.close()
+
+    OutboxEmail.objects.bulk_update(
+        emails, ["status", "next_attempt", "attempts", "sent", "error_message"]
+    )
+    return sent, len(emails) - sent
+
+
+def record_failure(email: OutboxEmail, error: Exception):
+    """Schedule an email to be retried after a failed attempt to send it, or mark it
+    as failed if it has been retried too many times."""
+    retries = getattr(settings, "LMS_EMAIL_RETRIES", 5)
+    backoff = getattr(settings, "LMS_EMAIL_BACKOFF", 60)
+    email.attempts += 1
+    email.error_message = repr(error)
+    if email.attempts > retries:
+        email.status = OutboxEmail.Status.FAILED
+    else:
+        delay = backoff * 2 ** (email.attempts - 1)
+        email.next_attempt = timezone.now() + timedelta(seconds=delay)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Optional
+
+from django.db.models import Q, QuerySet
+
+
+class KeysetPage:
+    """A page of objects from a `KeysetPaginator`, with the cursors of the pages before
+    and after it (None if there are no more objects in that direction)."""
+
+    def __init__(
+        self,
+        object_list: list,
+        next_cursor: Optional[str],
+        previous_cursor: Optional[str],
+    ):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Splits a queryset into pages by filtering on the values of its ordering fields at
+    the edge of the previous page (keyset pagination), rather than skipping the rows
+    before the page with an OFFSET, so deep pages are as fast to get as the first and
+    objects added or removed while paging don't shift the pages.
+
+    Pages are identified by opaque cursors encoding the ordering values of the object
+    at their edge, which are only ever compared against, so a tampered cursor can at
+    worst give a different page.
+
+    Args:
+        queryset: the objects to paginate
+        ordering: names of fields or annotations of the queryset to order it by,
+            prefixed with '-' for descending order, the last of which must be unique
+            and none of which can be null (e.g. `["-available_count", "isbn"]`)
+        page_size: number of objects on each page
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: list[str], page_size: int):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Get the page identified by a cursor, or the first page if there is no
+        cursor or it isn't valid."""
+        forwards, values = True, None
+        if cursor:
+            try:
+                forwards, values = self.decode_cursor(cursor)
+            except ValueError:
+                pass
+
+        ordering = self.ordering if forwards else self.reverse_ordering()
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.after_filter(ordering, values))
+        # fetch one extra object to find out whether there is another page
+        objects = list(queryset[: self.page_size + 1])
+        has_more = len(objects) > self.page_size
+        objects = objects[: self.page_size]
+        if not forwards:
+            objects.reverse()
+
+        # the page before the first page (or after the last) has no objects
+        has_next = has_more if forwards else values is not None
+        has_previous = values is not None if forwards else has_more
+        return KeysetPage(
+            objects,
+            self.encode_cursor(True, objects[-1]) if has_next and objects else None,
+            self.encode_cursor(False, objects[0]) if has_previous and objects else None,
+        )
+
+    def reverse_ordering(self) -> list[str]:
+        return [
+            name.removeprefix("-") if name.startswith("-") else f"-{name}"
+            for name in self.ordering
+        ]
+
+    @staticmethod
+    def after_filter(ordering: list[str], values: list) -> Q:
+        """Filter to the objects after the object with the given ordering values,
+        i.e. those with a greater first value, or the same first value and a greater
+        second value, and so on."""
+        after = None
+        for name, value in reversed(list(zip(ordering, values))):
+            field = name.removeprefix("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            greater = Q(**{f"{field}__{lookup}": value})
+            after = (
+                greater if after is None else greater | (Q(**{field: value}) & after)
+            )
+        return after
+
+    def encode_cursor(self, forwards: bool, obj) -> str:
+        values = [getattr(obj, name.removeprefix("-")) for name in self.ordering]
+        data = json.dumps([forwards, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple[bool, list]:
+        """Get the direction and ordering values of a cursor, raising ValueError if
+        it isn't valid."""
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            forwards, values = json.loads(data)
+        except (TypeError, ValueError):
+            raise ValueError("invalid cursor")
+        if (
+            not isinstance(forwards, bool)
+            or not isinstance(values, list)
+            or len(values) != len(self.ordering)
+            or not all(isinstance(value, (str, int, float)) for value in values)
+        ):
+            raise ValueError("invalid cursor")
+        return forwards, values
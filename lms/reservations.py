@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from django.db import transaction
+
+from lms.models import Book, BookCopy, Reservation
+from lms.signals import reservations_handled_in_bulk
+
+
+def release_expired(batch_size: int = 500) -> tuple[int, int]:
+    """
+    Delete the reservations that have expired without being collected and give
+    their copies to the reservations waiting longest for the same books, queueing
+    emails to let their users know, in transactions of at most `batch_size`
+    reservations (rather than the receivers doing it one reservation at a time).
+
+    Returns:
+        the number of reservations deleted, and the number assigned a copy
+    """
+    deleted = assigned = 0
+    while True:
+        with transaction.atomic(), reservations_handled_in_bulk():
+            expired = list(
+                Reservation.objects.expired()
+                .select_related("copy")
+                .order_by("ready_since", "pk")
+                .select_for_update(skip_locked=True, of=("self",))[:batch_size]
+            )
+            if not expired:
+                return deleted, assigned
+            Reservation.objects.filter(pk__in=[r.pk for r in expired]).delete()
+            assigned += len(
+                Reservation.objects.assign_copies([r.copy for r in expired if r.copy])
+            )
+            # update the counters of books whose copies weren't all reassigned
+            Book.objects.filter(pk__in={r.book_id for r in expired}).update_counts()
+        deleted += len(expired)
+
+
+def allocate_new_copies(copies: list[BookCopy]) -> list[Reservation]:
+    """
+    Give copies that have just been added (e.g. by an import) to the reservations
+    that have been waiting longest for their books in a single pass, queueing the
+    emails to let their users know together. Should be used with copies created in
+    `reservations_handled_in_bulk`, so they aren't each assigned as they're saved.
+
+    Returns:
+        the reservations assigned a copy
+    """
+    if not copies:
+        return []
+    with transaction.atomic():
+        return Reservation.objects.assign_copies(copies)
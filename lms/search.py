@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, QuerySet, Subquery, Value
+
+from lms.models import Author, Book, BookQuerySet, canonical_isbn
+
+# words of a search query, which are each matched as the prefix of a word so results
+# are found while the last word is still being typed
+QUERY_TERM_RE = re.compile(r"\w+")
+
+
+# statements refilling the FTS5 tables of the SQLite search index (see
+# `BookSearchEntry`), whose rows have the same rowids as their books and authors
+REBUILD_SEARCH_INDEX = [
+    "DELETE FROM lms_book_fts",
+    "DELETE FROM lms_author_fts",
+    """
+    INSERT INTO lms_book_fts (rowid, isbn, title, description, authors)
+    SELECT rowid, isbn, title, description, (
+        SELECT coalesce(group_concat(lms_author.name, ' '), '') FROM lms_author
+        INNER JOIN lms_book_authors ON lms_book_authors.author_id = lms_author.id
+        WHERE lms_book_authors.book_id = lms_book.isbn
+    ) FROM lms_book
+    """,
+    "INSERT INTO lms_author_fts (rowid, id, name) SELECT rowid, id, name FROM lms_author",
+]
+
+
+def rebuild_search_index() -> bool:
+    """Refill the SQLite search index from the books and authors, e.g. after a
+    VACUUM, which can renumber the rowids the index is kept up to date by. Returns
+    whether there was an index to rebuild (there isn't on other databases)."""
+    if connection.vendor != "sqlite":
+        return False
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in REBUILD_SEARCH_INDEX:
+            cursor.execute(statement)
+    return True
+
+
+def query_terms(query: str) -> list[str]:
+    return QUERY_TERM_RE.findall(query.lower())
+
+
+def fts_query(query: str) -> str:
+    """Get the SQLite FTS5 query matching rows containing words starting with each
+    word of a search query (e.g. `"hunger"* "gam"*`), quoting the words so
+    characters such as `-` and `*` aren't treated as FTS5 syntax."""
+    return " ".join(f'"{term}"*' for term in query_terms(query))
+
+
+def tsquery(query: str) -> str:
+    """Get the Postgres tsquery equivalent of `fts_query` (e.g. `hunger:* & gam:*`)."""
+    return " & ".join(f"{term}:*" for term in query_terms(query))
+
+
+def search_books(query: str) -> BookQuerySet:
+    """
+    Find the books matching a search query, annotated with their relevance to it (as
+    `relevance`, higher being more relevant) and ordered by it.
+
+    Queries that are an isbn (in either form), an edition id or a work id find the
+    books with that id. Other queries are matched against the title, description and
+    author names of each book, using the FTS5 index on SQLite (see `BookSearchEntry`)
+    and `tsvector`s on Postgres, falling back to substring matching of the title and
+    description on other databases.
+    """
+    isbn13 = canonical_isbn(query)
+    books = Book.objects.filter(
+        (Q(isbn13=isbn13) if isbn13 else Q(isbn=query))
+        | Q(edition_id__iexact=query)
+        | Q(work_id__iexact=query)
+    )
+    if books.exists():
+        return books.annotate(relevance=Value(0.0))
+    if not query_terms(query):
+        return Book.objects.none().annotate(relevance=Value(0.0))
+
+    if connection.vendor == "sqlite":
+        # bm25 ranks are lower for more relevant results
+        return (
+            Book.objects.filter(search_entry__index__match=fts_query(query))
+            .annotate(relevance=-F("search_entry__rank"))
+            .order_by("-relevance")
+        )
+    if connection.vendor == "postgresql":
+        # imported here as they need psycopg, which is only installed with Postgres
+        from django.contrib.postgres.aggregates import StringAgg
+        from django.contrib.postgres.search import (
+            SearchQuery,
+            SearchRank,
+            SearchVector,
+        )
+
+        author_names = Subquery(
+            Author.objects.filter(books=OuterRef("pk"))
+            .order_by()
+            .values("books")
+            .annotate(names=StringAgg("name", " "))
+            .values("names")
+        )
+        vector = (
+            SearchVector("title", weight="A")
+            + SearchVector(author_names, weight="B")
+            + SearchVector("description", weight="C")
+        )
+        search_query = SearchQuery(tsquery(query), search_type="raw")
+        return (
+            Book.objects.annotate(search=vector)
+            .filter(search=search_query)
+            .annotate(relevance=SearchRank(vector, search_query))
+            .order_by("-relevance")
+        )
+    return Book.objects.filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    ).annotate(relevance=Value(0.0))
+
+
+def search_authors(query: str) -> QuerySet[Author]:
+    """Find the authors whose names match a search query, annotated with their
+    relevance to it and ordered by it in the same way as `search_books`."""
+    if not query_terms(query):
+        return Author.objects.none().annotate(relevance=Value(0.0))
+
+    if connection.vendor == "sqlite":
+        return (
+            Author.objects.filter(search_entry__index__match=fts_query(query))
+            .annotate(relevance=-F("search_entry__rank"))
+            .order_by("-relevance")
+        )
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        search_query = SearchQuery(tsquery(query), search_type="raw")
+        return (
+            Author.objects.annotate(search=SearchVector("name"))
+            .filter(search=search_query)
+            .annotate(relevance=SearchRank(SearchVector("name"), search_query))
+            .order_by("-relevance")
+        )
+    return Author.objects.filter(name__icontains=query).annotate(relevance=Value(0.0))
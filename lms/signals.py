@@ -1,7 +1,32 @@
-from django.db.models.signals import post_delete
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from lms.models import Reservation
+from lms import suggestions
+from lms.models import Author, Book, BookCopy, Loan, Reservation
+
+# whether the reservation receivers are being skipped in the current thread
+_bulk = threading.local()
+
+
+@contextmanager
+def reservations_handled_in_bulk():
+    """Skip the receivers that reassign the copy of each deleted reservation, update
+    the copy counters of each changed reservation's book and assign each new copy to
+    a waiting reservation, for code that changes many reservations or copies and
+    does this for all of them at once (see `reservations.release_expired` and
+    `reservations.allocate_new_copies`)."""
+    # restored afterwards rather than cleared, so a nested block doesn't turn the
+    # receivers back on before the outer block ends
+    was_active = getattr(_bulk, "active", False)
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = was_active
 
 
 @receiver(post_delete, sender=Reservation)
@@ -9,13 +34,84 @@ def handle_reservation_delete(sender, instance, **kwargs):
     """Assign book copy to any outstanding reservations when a reservation is
     deleted."""
 
-    # get reservation that has been waiting the longest for a book (the 'first')
-    reservation = Reservation.objects.filter(
-        copy__isnull=True, book=instance.book
-    ).first()
+    if getattr(_bulk, "active", False):
+        return
+
+    # give the copy of the reservation that was just deleted (if it had one and it
+    # hasn't been loaned out to the reservation's user) to the reservation that has
+    # been waiting the longest for the book
+    if instance.copy_id:
+        Reservation.objects.assign_to_next(instance.copy, email_on_success=True)
+
+
+@receiver(post_delete, sender=Book)
+def handle_book_delete(sender, instance, **kwargs):
+    """Delete the cover of a deleted book if no other book shares it."""
+    Book.release_cover(instance.cover_file.name)
+
+
+@receiver(post_save, sender=BookCopy)
+@receiver(post_delete, sender=BookCopy)
+def handle_book_copy_change(sender, instance, **kwargs):
+    """Update the copy counters of the book a copy belongs to (and the book it
+    belonged to before, if it has been moved) when it is created, changed or
+    deleted."""
+    book_ids = {instance.book_id, getattr(instance, "_loaded_book_id", None)}
+    Book.objects.filter(pk__in=book_ids - {None}).update_counts()
+    instance._loaded_book_id = instance.book_id
+
+
+@receiver(post_save, sender=BookCopy)
+def handle_book_copy_create(sender, instance, created, **kwargs):
+    """Assign a new copy to the reservation that has been waiting the longest for
+    its book (e.g. when it's added with `BookCopy.from_isbn` or in the admin)."""
+    if created and not getattr(_bulk, "active", False):
+        with transaction.atomic():
+            Reservation.objects.assign_copies([instance])
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def handle_loan_change(sender, instance, **kwargs):
+    """Update the copy counters of a book when one of its copies is loaned out or
+    returned."""
+    Book.objects.filter(copies=instance.book_id).update_counts()
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def handle_reservation_change(sender, instance, **kwargs):
+    """Update the copy counters of a book when a reservation is assigned one of its
+    copies, or a reservation holding one is deleted."""
+    if getattr(_bulk, "active", False):
+        return
+    Book.objects.filter(pk=instance.book_id).update_counts()
+
+
+@receiver(post_save, sender=Book)
+def handle_book_save(sender, instance, **kwargs):
+    """Update the search suggestions for the title and isbns of a saved book, once
+    it is committed."""
+    transaction.on_commit(
+        lambda: suggestions.apply_change(lambda index: index.update_book(instance))
+    )
+
+
+@receiver(post_save, sender=Author)
+def handle_author_save(sender, instance, **kwargs):
+    """Update the search suggestions for the name of a saved author, once it is
+    committed."""
+    transaction.on_commit(
+        lambda: suggestions.apply_change(lambda index: index.update_author(instance))
+    )
+
 
-    # manually assign the book copy of the reservation that was just deleted
-    # to an outstanding reservation if found and save it
-    if reservation:
-        reservation.assign_book_copy(copy=instance.copy, email_on_success=True)
-        reservation.save()
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def handle_suggestion_delete(sender, instance, **kwargs):
+    """Remove a deleted book or author from the search suggestions, once the deletion
+    is committed."""
+    item = ("book" if sender is Book else "author", instance.pk)
+    transaction.on_commit(
+        lambda: suggestions.apply_change(lambda index: index.remove(item))
+    )
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from lms import openlibrary
+from lms.httpclient import get_client
+
+# Fixture files are laid out in the fixtures directory as:
+#   isbn/<isbn>.json      Books API (jscmd=data) record for the isbn
+#   books/<OLID>.json     edition record
+#   works/<OLID>.json     work record
+#   covers/<file name>    cover image, served at /b/id/<file name>
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    """Serves the parts of the OpenLibrary API used by the book importer from fixture
+    files, adding latency and random errors as configured on the server."""
+
+    server: StandinServer
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            return self.send_body(503, b"", "text/plain")
+
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if url.path == "/api/books":
+            return self.send_books(parse_qs(url.query).get("bibkeys", [""])[0])
+        if len(parts) == 2 and parts[0] in ("books", "works"):
+            return self.send_record(parts[0], parts[1])
+        if len(parts) == 3 and parts[:2] == ["b", "id"]:
+            return self.send_cover(parts[2])
+        return self.send_body(404, b"", "text/plain")
+
+    def send_books(self, bibkeys: str):
+        """Send the Books API records of each isbn in the bibkeys that has a fixture,
+        pointing their cover urls at this server."""
+        data = {}
+        for bibkey in filter(None, bibkeys.split(",")):
+            path = self.fixture_path("isbn", bibkey.removeprefix("ISBN:") + ".json")
+            if path is not None and path.exists():
+                content = path.read_text().replace(
+                    openlibrary.COVERS_URL, self.server.base_url
+                )
+                data[bibkey] = json.loads(content)
+        self.send_json(200, data)
+
+    def send_record(self, kind: str, file_name: str):
+        path = self.fixture_path(kind, file_name)
+        if path is None or not path.exists():
+            # the real API responds with a JSON error rather than an empty 404
+            key = f"/{kind}/{file_name.removesuffix('.json')}"
+            return self.send_json(404, {"error": "notfound", "key": key})
+        self.send_body(200, path.read_bytes(), "application/json")
+
+    def send_cover(self, file_name: str):
+        path = self.fixture_path("covers", file_name)
+        if path is None or not path.exists():
+            return self.send_body(404, b"", "text/plain")
+        self.send_body(200, path.read_bytes(), "image/jpeg")
+
+    def fixture_path(self, kind: str, file_name: str) -> Optional[Path]:
+        """Get the path of a fixture file, or None if the file name would escape the
+        fixtures directory."""
+        if "/" in file_name or file_name.startswith("."):
+            return None
+        return self.server.fixtures_dir / kind / file_name
+
+    def send_json(self, status: int, data: dict):
+        self.send_body(status, json.dumps(data).encode(), "application/json")
+
+    def send_body(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StandinServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenLibrary API and covers API, serving recorded responses
+    from a fixtures directory so imports can be tested and benchmarked without
+    openlibrary.org.
+
+    Args:
+        fixtures_dir: directory containing the fixture files
+        address: (host, port) to listen on (port 0 picks a free port)
+        latency: seconds to wait before responding to each request
+        error_rate: fraction of requests (0-1) to respond to with a 503 error
+        verbose: whether to log each request
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        fixtures_dir: Path,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0,
+        error_rate: float = 0,
+        verbose: bool = False,
+    ):
+        super().__init__(address, StandinRequestHandler)
+        self.fixtures_dir = Path(fixtures_dir)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """Serve requests in a background thread (stopped with `shutdown`)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def record_fixtures(isbns: list[str], fixtures_dir: Path) -> list[str]:
+    """
+    Record the OpenLibrary responses needed to import each isbn into a fixtures
+    directory, using the API configured in the settings.
+
+    Args:
+        isbns: cleaned isbn-10s or isbn-13s
+        fixtures_dir: directory to write the fixture files to
+
+    Returns:
+        the isbns that weren't found
+    """
+    fixtures_dir = Path(fixtures_dir)
+    for kind in ("isbn", "books", "works", "covers"):
+        (fixtures_dir / kind).mkdir(parents=True, exist_ok=True)
+
+    not_found = []
+    for isbn in isbns:
+        book_data = openlibrary.fetch_books_api_batch([isbn]).get(isbn)
+        if book_data is None:
+            not_found.append(isbn)
+            continue
+        (fixtures_dir / "isbn" / f"{isbn}.json").write_text(json.dumps(book_data))
+
+        edition_id = openlibrary.get_id_from_key(book_data["key"])
+        edition_data = openlibrary.fetch_edition_api_data(edition_id)
+        (fixtures_dir / "books" / f"{edition_id}.json").write_text(
+            json.dumps(edition_data)
+        )
+        if "works" in edition_data:
+            work_id = openlibrary.get_id_from_key(edition_data["works"][0]["key"])
+            (fixtures_dir / "works" / f"{work_id}.json").write_text(
+                json.dumps(openlibrary.fetch_work_api_data(work_id))
+            )
+
+        for cover_url in book_data.get("cover", {}).values():
+            file_name = urlparse(cover_url).path.rsplit("/", 1)[-1]
+            (fixtures_dir / "covers" / file_name).write_bytes(
+                get_client().get_content(cover_url)
+            )
+    return not_found
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from lms.models import Author, Book, clean_isbn
+
+# only the start of each key is stored, as suggestions are for partly typed queries
+KEY_LENGTH = 40
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalise(text: str) -> str:
+    """Lowercase text and remove its accents and punctuation, so e.g. 'Éclair-Cakes'
+    and 'eclair cakes' give the same key."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return NON_WORD_RE.sub(" ", text).strip()
+
+
+def word_keys(text: str) -> set[str]:
+    """Get the keys a title or name is found by: the text from the start of each of
+    its words, so 'The Hunger Games' is suggested for 'hun' and 'gam' as well as
+    'the'."""
+    words = normalise(text).split()
+    return {" ".join(words[index:])[:KEY_LENGTH] for index in range(len(words))}
+
+
+def book_keys(title: str, isbn: str, isbn13: str) -> set[str]:
+    """Get the keys a book is found by: its title and either of its isbns."""
+    return (word_keys(title) | {isbn, isbn13}) - {""}
+
+
+class SuggestionIndex:
+    """
+    In-memory index of book titles, author names and isbns, kept as a sorted list of
+    `(key, kind, id)` entries so the entries with keys starting with a prefix are
+    found with a binary search and are next to each other.
+
+    Books (by isbn) and authors (by id) can be added and removed as they are saved
+    and deleted (see `apply_change`), which is thread-safe but only updates the index
+    of the current process, so `get_index` also rebuilds it periodically.
+    """
+
+    def __init__(self):
+        self.entries: list[tuple[str, str, str]] = []
+        # keys, and the slug of the url and the text shown, of each book and author
+        self.keys: dict[tuple[str, str], set[str]] = {}
+        self.labels: dict[tuple[str, str], tuple[str, str]] = {}
+        self.lock = threading.Lock()
+        self.built = time.monotonic()
+
+    @classmethod
+    def build(cls) -> SuggestionIndex:
+        """Build an index of every book and author from a single query of each."""
+        index = cls()
+        books = Book.objects.values_list("isbn", "isbn13", "edition_id", "title")
+        for isbn, isbn13, edition_id, title in books.iterator():
+            index.set_keys(
+                ("book", isbn), book_keys(title, isbn, isbn13), edition_id, title
+            )
+        for author_id, name in Author.objects.values_list("id", "name").iterator():
+            index.set_keys(("author", author_id), word_keys(name), author_id, name)
+        index.entries = sorted(
+            (key, kind, target)
+            for (kind, target), keys in index.keys.items()
+            for key in keys
+        )
+        return index
+
+    def set_keys(self, item: tuple[str, str], keys: set[str], slug: str, label: str):
+        self.keys[item] = keys
+        self.labels[item] = (slug, label)
+
+    def update(self, item: tuple[str, str], keys: set[str], slug: str, label: str):
+        """Add a book or author to the index, or replace its keys if it's already in
+        it, inserting only the keys that have changed."""
+        with self.lock:
+            old_keys = self.keys.get(item, set())
+            self.remove_entries(item, old_keys - keys)
+            for key in keys - old_keys:
+                bisect.insort(self.entries, (key, *item))
+            self.set_keys(item, keys, slug, label)
+
+    def update_book(self, book: Book):
+        keys = book_keys(book.title, book.isbn, book.isbn13)
+        self.update(("book", book.isbn), keys, book.edition_id, book.title)
+
+    def update_author(self, author: Author):
+        self.update(
+            ("author", author.id), word_keys(author.name), author.id, author.name
+        )
+
+    def remove(self, item: tuple[str, str]):
+        """Remove a book (`("book", isbn)`) or author (`("author", id)`) from the
+        index."""
+        with self.lock:
+            self.remove_entries(item, self.keys.pop(item, set()))
+            self.labels.pop(item, None)
+
+    def remove_entries(self, item: tuple[str, str], keys: set[str]):
+        for key in keys:
+            entry = (key, *item)
+            position = bisect.bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def search(self, query: str, limit: int) -> list[tuple[str, str, str]]:
+        """
+        Get the books and authors with a title, name or isbn starting with a query
+        (or with a word of their title or name starting with it), each at most once.
+
+        Args:
+            query: partly typed search query
+            limit: maximum number of results
+
+        Returns:
+            the kind ('book' or 'author'), url slug and text of each result, in
+            order of the key they were found by
+        """
+        prefixes = [normalise(query)[:KEY_LENGTH]]
+        # isbns are typed with or without dashes
+        isbn = clean_isbn(query)
+        if isbn[:1].isdigit() and isbn != prefixes[0]:
+            prefixes.append(isbn)
+
+        results = {}
+        with self.lock:
+            for prefix in filter(None, prefixes):
+                position = bisect.bisect_left(self.entries, (prefix,))
+                while len(results) < limit and position < len(self.entries):
+                    key, kind, target = self.entries[position]
+                    if not key.startswith(prefix):
+                        break
+                    results.setdefault((kind, target), self.labels[(kind, target)])
+                    position += 1
+        return [(kind, slug, label) for (kind, _), (slug, label) in results.items()]
+
+
+_index: Optional[SuggestionIndex] = None
+# changes to apply to the index being rebuilt once it's built, or None if it isn't
+# being rebuilt
+_pending: Optional[list[Callable[[SuggestionIndex], None]]] = None
+_index_lock = threading.Lock()
+# held by the thread rebuilding the index
+_build_lock = threading.Lock()
+
+
+def get_index() -> SuggestionIndex:
+    """Get the suggestion index of this process, building it the first time it is
+    used and again once it is older than the `LMS_SUGGESTION_INDEX_TTL` setting (as
+    changes made by other processes, or without sending signals, aren't patched
+    into it). The old index is used by other threads while one thread rebuilds it,
+    so only the first build is waited for."""
+    global _index, _pending
+    ttl = getattr(settings, "LMS_SUGGESTION_INDEX_TTL", 300)
+    index = _index
+    if index is not None and time.monotonic() - index.built <= ttl:
+        return index
+    if not _build_lock.acquire(blocking=index is None):
+        return index
+    try:
+        # another thread may have built it while this one was waiting
+        if _index is not None and time.monotonic() - _index.built <= ttl:
+            return _index
+        with _index_lock:
+            _pending = []
+        try:
+            new_index = SuggestionIndex.build()
+        except BaseException:
+            with _index_lock:
+                _pending = None
+            raise
+        with _index_lock:
+            # changes committed while it was being built may not have been read
+            for change in _pending:
+                change(new_index)
+            _pending = None
+            _index = new_index
+        return new_index
+    finally:
+        _build_lock.release()
+
+
+def apply_change(change: Callable[[SuggestionIndex], None]):
+    """Patch a change to a book or author into the suggestion index of this process
+    if it has been built (e.g. `lambda index: index.update_book(book)`), and into
+    the index being rebuilt once it's built, so the change isn't lost."""
+    with _index_lock:
+        index = _index
+        if _pending is not None:
+            _pending.append(change)
+    if index is not None:
+        change(index)
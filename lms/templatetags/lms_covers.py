@@ -0,0 +1,12 @@
+from django import template
+
+from lms.models import Book
+
+register = template.Library()
+
+
+@register.filter
+def cover_variant(book: Book, size: str):
+    """Get the url of a book's cover resized for where it is shown, e.g.
+    `{{ book|cover_variant:"thumbnail" }}` (see `Book.cover_variant`)."""
+    return book.cover_variant(size)
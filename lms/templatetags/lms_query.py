@@ -0,0 +1,17 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def querystring(context, **kwargs):
+    """Get the query string of the current request with some parameters set (or
+    removed if set to None), e.g. `{% querystring sort="title" cursor=None %}`, like
+    the tag of the same name added in Django 5.1."""
+    params = context["request"].GET.copy()
+    for key, value in kwargs.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+    return f"?{params.urlencode()}"
@@ -1,4 +1,5 @@
-from django.conf.urls.static import static
+import re
+
 from django.urls import path, include, re_path
 
 from lms_base import settings
@@ -11,6 +12,7 @@ urlpatterns = [
     re_path(
         r"^search/(?P<type>books|authors)/$", views.SearchView.as_view(), name="search"
     ),
+    path("search/suggestions/", views.search_suggestions, name="search_suggestions"),
     path("book/<edition_id>/", views.BookDetailView.as_view(), name="view_book"),
     path("author/<author_id>/", views.AuthorDetailView.as_view(), name="view_author"),
     path("reserve/<edition_id>/", views.ReserveView.as_view(), name="reserve_book"),
@@ -25,6 +27,11 @@ urlpatterns = [
     path("kiosk/return/<uuid:pk>/", views.KioskReturn.as_view(), name="kiosk_return"),
     # admin site (django defaults included in lms_base urls.py)
     path("admin/import-book/", views.import_book, name="import_book"),
+    path(
+        "admin/import-book/<uuid:job_id>/",
+        views.import_book_progress,
+        name="import_book_progress",
+    ),
     path(
         "admin/generate-accession-codes/",
         views.AccessionCodeGenerationView.as_view(),
@@ -32,5 +39,10 @@ urlpatterns = [
     ),
     path("admin/activate-kiosk/", views.activate_kiosk, name="activate_kiosk"),
     path("admin/deactivate-kiosk/", views.deactivate_kiosk, name="deactivate_kiosk"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-# pass static file configuration
+    # uploaded files (book covers) with caching headers
+    re_path(
+        rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$",
+        views.serve_media,
+        name="media",
+    ),
+]
@@ -1,19 +1,28 @@
 import datetime
 import json
+import mimetypes
 import random
+from pathlib import Path
+from stat import S_ISREG
 
 from django import http
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Q
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Count, Prefetch
 from django.http import JsonResponse
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.urls import reverse_lazy, reverse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
 from django.utils.datastructures import MultiValueDictKeyError
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 from django.views.generic import (
     DetailView,
     ListView,
@@ -24,15 +33,24 @@ from django.views.generic import (
     TemplateView,
 )
 
+from lms import covers, search, suggestions
 from lms.errors import (
     MaxLoansError,
-    ObjectExistsError,
-    APINotFoundError,
     MaxRenewalsError,
     BookUnavailableError,
 )
 from lms.forms import LibraryUserCreationForm, LibraryUserProfileForm
-from lms.models import BookCopy, Book, Author, LibraryUser, Loan, Reservation
+from lms.models import (
+    BookCopy,
+    Book,
+    BookQuerySet,
+    Author,
+    ImportJob,
+    LibraryUser,
+    Loan,
+    Reservation,
+)
+from lms.pagination import KeysetPaginator
 from lms.permissions import KioskPermissionMixin
 
 
@@ -170,13 +188,61 @@ class MainHome(ListView):
         return data
 
 
-class SearchView(ListView):
+# ordering of lists of books for each value of the `sort` query parameter, ending
+# with the isbn so every book has a unique position for keyset pagination
+BOOK_LIST_ORDERINGS = {
+    "relevance": ["-relevance", "isbn"],
+    "title": ["title", "isbn"],
+    "-title": ["-title", "-isbn"],
+    "author": ["first_author_name", "title", "isbn"],
+    "-author": ["-first_author_name", "-title", "-isbn"],
+    "copies": ["available_count", "title", "isbn"],
+    "-copies": ["-available_count", "-title", "-isbn"],
+}
+
+
+class BookListMixin:
+    """Provide a page of books for the book list component, sorted by the `sort`
+    query parameter (one of `book_sorts`), filtered to those with available copies if
+    the `available` query parameter is set and starting from the `cursor` query
+    parameter."""
+
+    book_sorts = ["title", "-title", "author", "-author", "copies", "-copies"]
+    default_book_sort = "title"
+
+    def get_book_list_context(self, books: BookQuerySet) -> dict:
+        sort = self.request.GET.get("sort", self.default_book_sort)
+        if sort not in self.book_sorts:
+            sort = self.default_book_sort
+        only_available = bool(self.request.GET.get("available"))
+        if only_available:
+            books = books.filter(available_count__gt=0)
+        if sort in ("author", "-author"):
+            books = books.with_first_author_name()
+        paginator = KeysetPaginator(
+            books.with_authors(),
+            BOOK_LIST_ORDERINGS[sort],
+            getattr(settings, "LMS_BOOK_LIST_PAGE_SIZE", 24),
+        )
+        page = paginator.page(self.request.GET.get("cursor"))
+        return {
+            "books": page.object_list,
+            "page": page,
+            "sort": sort,
+            "only_available": only_available,
+        }
+
+
+class SearchView(BookListMixin, ListView):
     """Render the search results template with either book or author objects
     (depending on the path the request is sent to) and showing objects that
-    match the results of a search using the query specified."""
+    match the results of a search using the query specified. Books are shown a page
+    at a time, most relevant first by default."""
 
     template_name = "lms/main/search_results.html"
     model = Book
+    book_sorts = ["relevance"] + BookListMixin.book_sorts
+    default_book_sort = "relevance"
 
     def get_queryset(self):
         # ensure query was passed in GET parameters
@@ -186,17 +252,38 @@ class SearchView(ListView):
             return None
         # return either book or author objects depending on the second path segment
         if self.kwargs["type"] == "books":
-            books = Book.objects.filter(
-                Q(title__icontains=query)
-                | Q(description__icontains=query)
-                | Q(isbn=query)
-                | Q(edition_id__iexact=query)
-                | Q(work_id__iexact=query)
-            )
-            return books
+            return search.search_books(query)
         elif self.kwargs["type"] == "authors":
-            authors = Author.objects.filter(name__icontains=query)
-            return authors
+            return search.search_authors(query).annotate(num_books=Count("books"))
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        data = super().get_context_data(object_list=object_list, **kwargs)
+        if self.kwargs["type"] == "books" and self.object_list is not None:
+            data.update(self.get_book_list_context(self.object_list))
+            # only the books on the page are shown, so don't load the rest
+            data["object_list"] = data["books"]
+        return data
+
+
+@require_safe
+def search_suggestions(request):
+    """Returns the books and authors with a title, name or isbn starting with the
+    query (the `q` GET parameter) as JSON, from the in-memory suggestion index so
+    the search box can suggest them as they are typed."""
+    limit = getattr(settings, "LMS_SEARCH_SUGGESTIONS", 8)
+    results = suggestions.get_index().search(request.GET.get("q", ""), limit)
+    return JsonResponse(
+        {
+            "suggestions": [
+                {
+                    "type": kind,
+                    "label": label,
+                    "url": reverse(f"view_{kind}", args=(slug,)),
+                }
+                for kind, slug, label in results
+            ]
+        }
+    )
 
 
 class UserProfileView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
@@ -219,9 +306,12 @@ class UserProfileView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
         data["available_reservations"] = self.request.user.reservations.filter(
             copy__isnull=False
         ).order_by("ready_since")
-        # get all the user's reservations that DO NOT have copies assigned to them
+        # get all the user's reservations that DO NOT have copies assigned to them,
+        # with the date a copy of each book is next expected back
         data["not_available_reservations"] = self.request.user.reservations.filter(
             copy__isnull=True
+        ).prefetch_related(
+            Prefetch("book", queryset=Book.objects.with_next_available().with_authors())
         )
         return data
 
@@ -235,8 +325,12 @@ class BookDetailView(DetailView):
     slug_field = "edition_id"
     slug_url_kwarg = "edition_id"
 
+    def get_queryset(self):
+        return Book.objects.with_authors().with_copies()
+
     def get_context_data(self, *, object_list=None, **kwargs):
         data = super().get_context_data(object_list=object_list, **kwargs)
+        data["other_editions"] = list(self.object.other_editions)
         # get a list of the IDs of every author of the book
         authors = [author.id for author in self.object.authors.all()]
         # get a list of books that were written by at least one of the authors from
@@ -251,15 +345,24 @@ class BookDetailView(DetailView):
         return data
 
 
-class AuthorDetailView(DetailView):
-    """Render a detail view for author objects, displaying a list of their books,
-    alongside accompanying information, in either card or list format."""
+class AuthorDetailView(BookListMixin, DetailView):
+    """Render a detail view for author objects, displaying a page of their books
+    (optionally only those matching a search query), alongside accompanying
+    information, in either card or list format."""
 
     template_name = "lms/main/view_author.html"
     model = Author
     slug_field = "id"
     slug_url_kwarg = "author_id"
 
+    def get_context_data(self, *, object_list=None, **kwargs):
+        data = super().get_context_data(object_list=object_list, **kwargs)
+        books = self.object.books.all()
+        if query := self.request.GET.get("q"):
+            books = search.search_books(query).filter(authors=self.object)
+        data.update(self.get_book_list_context(books))
+        return data
+
 
 class ReserveView(LoginRequiredMixin, CreateView):
     """Render information about a book with the option to confirm making a
@@ -358,9 +461,9 @@ class RenewalView(LoginRequiredMixin, UpdateView):
 def import_book(request):
     """Renders the book import template on a GET request. On POST request, deserialises
     JSON in POST request body and splits multiple accession code objects into multiple
-    single accession code objects, then creates books, and if necessary book copies from
-    these ISBNS (and accession codes) using the 'from_isbn' class methods on these model
-    classes."""
+    single accession code objects, then submits these ISBNs (and accession codes) as an
+    import job to be imported by a worker process, returning the ID of the job so its
+    progress can be polled."""
     if request.method == "POST":
         try:
             # deserialise the JSON from the POST body and extract the useful fields
@@ -384,71 +487,19 @@ def import_book(request):
                         )
                 fields = new_fields
 
-            # initialise results variables to be passed back to frontend in response
-            errors = []
-            successes = []
-            accessions_in_successes = False
-
-            # attempt to import a book, and book copy if accession are included, from
-            # each provided ISBN (/accession code), saving any errors to the object
-            # and putting it in the errors list while putting any successes
-            # in the successes list
-            for field in fields:
-                try:
-                    if includes_accessions:
-                        book_copy = BookCopy.from_isbn(
-                            field["isbn"], field["accession"]
-                        )
-                    else:
-                        book = Book.from_isbn(field["isbn"])
-                except ObjectExistsError:
-                    field["error"] = "ObjectExistsError"
-                    errors.append(field)
-                except APINotFoundError:
-                    field["error"] = "APINotFoundError"
-                    errors.append(field)
-                else:
-                    # place some basic information from each imported book into a plain
-                    # python dictionary to be serialised into json
-                    if includes_accessions:
-                        accessions_in_successes = True
-                        successes.append(
-                            {
-                                "isbn": book_copy.book.isbn,
-                                "edition_id": book_copy.book.edition_id,
-                                "title": book_copy.book.title,
-                                "authors": book_copy.book.authors_name_string,
-                                "accession": book_copy.accession_code,
-                                "admin_url": reverse(
-                                    "admin:lms_book_change",
-                                    args=(book_copy.book.pk,),
-                                ),
-                                "site_url": book_copy.book.get_absolute_url(),
-                            }
-                        )
-                    else:
-                        successes.append(
-                            {
-                                "isbn": book.isbn,
-                                "edition_id": book.edition_id,
-                                "title": book.title,
-                                "authors": book.authors_name_string,
-                                "admin_url": reverse(
-                                    "admin:lms_book_change",
-                                    args=(book.pk,),
-                                ),
-                                "site_url": book.get_absolute_url(),
-                            }
-                        )
+            # submit the rows to be imported by a worker (see the run_import_worker
+            # management command)
+            job = ImportJob.objects.create(
+                user=request.user,
+                rows=fields,
+                includes_accessions=includes_accessions,
+            )
 
             # return json to the javascript component on the frontend
             return JsonResponse(
                 {
-                    "errors": errors,
-                    "successes": {
-                        "book_data": successes,
-                        "includes_accessions": accessions_in_successes,
-                    },
+                    "job_id": str(job.id),
+                    "progress_url": reverse("import_book_progress", args=(job.id,)),
                 }
             )
 
@@ -459,6 +510,28 @@ def import_book(request):
         return render(request, "lms/admin/import_book.html")
 
 
+@staff_member_required
+@permission_required("lms.book.add", login_url=reverse_lazy("admin:login"))
+def import_book_progress(request, job_id):
+    """Returns the progress of an import job as JSON, including the rows that failed
+    and information on the books (copies) created so far. Jobs whose worker has
+    stopped are shown as failed, so the page stops waiting for them."""
+    ImportJob.fail_stale()
+    job = get_object_or_404(ImportJob, id=job_id)
+    return JsonResponse(
+        {
+            "status": job.status,
+            "rows_done": job.rows_done,
+            "rows_total": len(job.rows),
+            "errors": job.errors,
+            "successes": {
+                "book_data": job.successes,
+                "includes_accessions": job.includes_accessions and bool(job.successes),
+            },
+        }
+    )
+
+
 class AccessionCodeGenerationView(TemplateView):
     """Renders a template capable of generating any number of accession codes with
     accompanying QR codes, ready to be printed. Defaults to ensuring that only
@@ -521,3 +594,48 @@ class UserRegistrationView(FormView):
 
         # redirect the user to the success url (the profile page)
         return http.HttpResponseRedirect(self.get_success_url())
+
+
+############
+# Media
+############
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file (e.g. a book cover) from the media directory. Content
+    addressed covers and their resized versions never change, so browsers are told to
+    cache them forever; other files are revalidated with their ETag and modification
+    time, only being sent again if they have changed."""
+    try:
+        full_path = Path(safe_join(settings.MEDIA_ROOT, path))
+        stat = full_path.stat()
+    except (SuspiciousFileOperation, OSError):
+        raise http.Http404("File not found")
+    if not S_ISREG(stat.st_mode):
+        raise http.Http404("File not found")
+
+    content_type, encoding = mimetypes.guess_type(full_path.name)
+    content_type = content_type or "application/octet-stream"
+    if request.method == "HEAD":
+        response = http.HttpResponse(content_type=content_type)
+    else:
+        response = http.FileResponse(full_path.open("rb"), content_type=content_type)
+    response["Content-Length"] = stat.st_size
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["ETag"] = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if covers.is_immutable(path):
+        response["Cache-Control"] = f"public, max-age={60 * 60 * 24 * 365}, immutable"
+    else:
+        response["Cache-Control"] = "public, no-cache"
+
+    # respond with 304 Not Modified (without the file) if the browser's copy is current
+    conditional_response = get_conditional_response(
+        request,
+        etag=response["ETag"],
+        last_modified=int(stat.st_mtime),
+        response=response,
+    )
+    if conditional_response is not response:
+        response.close()
+    return conditional_response
@@ -135,3 +135,43 @@ MEDIA_URL = "uploads/"
 AUTH_USER_MODEL = "lms.LibraryUser"
 LOGOUT_REDIRECT_URL = "/"
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# emails are sent from an outbox by `manage.py run_email_dispatcher`, which retries
+# emails that can't be sent up to LMS_EMAIL_RETRIES times, waiting LMS_EMAIL_BACKOFF
+# seconds before the first retry and doubling the wait each time
+LMS_EMAIL_RETRIES = 5
+LMS_EMAIL_BACKOFF = 60
+
+# Book import
+# number of worker threads making requests to OpenLibrary at once when importing
+LMS_IMPORT_WORKERS = 8
+# seconds a running import or cover download job can go without its worker showing
+# it's still running before it's marked as failed
+LMS_JOB_TIMEOUT = 300
+# base urls of the OpenLibrary API and covers, which can be pointed at a local stand-in
+# server (`manage.py run_openlibrary_standin`) to test or benchmark imports offline
+LMS_OPENLIBRARY_URL = "https://openlibrary.org"
+LMS_OPENLIBRARY_COVERS_URL = "https://covers.openlibrary.org"
+# maximum number of concurrent requests to each OpenLibrary host (api/covers)
+LMS_OPENLIBRARY_HOST_CONCURRENCY = 4
+# client used for OpenLibrary requests (see lms/httpclient.py)
+LMS_OPENLIBRARY_TIMEOUT = 10  # seconds to wait for a connection/data
+LMS_OPENLIBRARY_RETRIES = 3  # retries after a 429/5xx response or connection error
+LMS_OPENLIBRARY_BACKOFF = 0.5  # seconds before the first retry, doubling each time
+LMS_OPENLIBRARY_RATE_LIMIT = 10  # requests per second on average (None for no limit)
+# on-disk cache of OpenLibrary responses (set the directory to None to disable it)
+LMS_OPENLIBRARY_CACHE_DIR = BASE_DIR / "openlibrary_cache"
+LMS_OPENLIBRARY_CACHE_TTL = 60 * 60 * 24 * 30  # seconds
+LMS_OPENLIBRARY_CACHE_MAX_SIZE = 500 * 1024 * 1024  # bytes
+# seconds to remember that an ISBN wasn't found, so it isn't requested again
+LMS_OPENLIBRARY_NEGATIVE_CACHE_TTL = 60 * 60 * 24
+# only serve OpenLibrary data from the cache, never sending requests (e.g. for tests)
+LMS_OPENLIBRARY_OFFLINE = False
+
+# Catalogue
+# number of books on each page of search results and author pages
+LMS_BOOK_LIST_PAGE_SIZE = 24
+# maximum number of suggestions shown while typing in the search box, and seconds
+# before each process rebuilds its index of suggestions from the database (picking up
+# changes made by other processes)
+LMS_SEARCH_SUGGESTIONS = 8
+LMS_SUGGESTION_INDEX_TTL = 300